@@ -1,22 +1,263 @@
 import os
-from datetime import datetime
-from flask import Flask, request, jsonify
+import math
+import atexit
+import base64
+import hashlib
+import json
+import secrets
+import time
+import mimetypes
+import zlib
+from datetime import datetime, timedelta
+from functools import partial, wraps
+from urllib.parse import urlencode
+import click
+from flask import Flask, Blueprint, Response, current_app, request, jsonify, send_file, url_for, g, abort, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
+from timeline_store import InMemoryTimelineStore
+from blob_store import LocalBlobStore, is_data_url, decode_data_url, media_extension, parse_blob_name
+from response_cache import LRUCache, CachedResponse
+from user_search import search_backend_for, PrefixIndex, PrefixIndexRefresher
+from instrumentation import Instrumentation
+from counter_buffer import CounterBuffer
+from auth_tokens import TokenSigner, InvalidToken
+from event_broker import EventBroker, OVERFLOWED, format_event
+from db_routing import RoutingSession, ReplicaRouter
+from trending import TrendingIndex, TrendingRefresher
+from json_provider import provider_class
+from compression import ResponseCompressor, choose_encoding
+import migrations
+import bulk_import
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-# Configure database
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///murmur.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    "pool_pre_ping": True,
-    "pool_recycle": 300,
-}
-db = SQLAlchemy(app)
+# Routes and CLI commands; registered on the app by create_app()
+api = Blueprint('api', __name__, cli_group=None)
+
+def service(name):
+    # Per-app objects built by create_app(), looked up on the current app
+    return LocalProxy(lambda: current_app.extensions['murmur'][name])
+
+timeline_store = service('timeline_store')
+blob_store = service('blob_store')
+response_cache = service('response_cache')
+like_counter_buffer = service('like_counter_buffer')
+event_broker = service('event_broker')
+token_signer = service('token_signer')
+replica_router = service('replica_router')
+typeahead_index = service('typeahead_index')
+typeahead_refresher = service('typeahead_refresher')
+trending_index = service('trending_index')
+trending_refresher = service('trending_refresher')
+
+def env_flag(name, default=''):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+def env_number(name, cast):
+    # None when unset, so the library default applies
+    value = os.environ.get(name)
+    return cast(value) if value else None
+
+def load_config(app):
+    # Configure database
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///murmur.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Connection pool of each process (every gunicorn worker has its own).
+    # Unset values keep SQLAlchemy's defaults.
+    app.config['DATABASE_POOL_SIZE'] = env_number('DATABASE_POOL_SIZE', int)
+    app.config['DATABASE_MAX_OVERFLOW'] = env_number('DATABASE_MAX_OVERFLOW', int)
+    app.config['DATABASE_POOL_TIMEOUT'] = env_number('DATABASE_POOL_TIMEOUT', float)
+    app.config['DATABASE_POOL_RECYCLE'] = int(os.environ.get('DATABASE_POOL_RECYCLE', 300))
+    app.config['DATABASE_POOL_PRE_PING'] = env_flag('DATABASE_POOL_PRE_PING', 'true')
+    
+    # Optional read replicas (comma-separated URLs), registered as binds
+    # replica_0, replica_1, ... Read routes use a random replica unless the caller
+    # wrote within the last READ_YOUR_WRITES_WINDOW seconds.
+    app.config['SQLALCHEMY_REPLICA_URLS'] = [url.strip() for url in os.environ.get('SQLALCHEMY_REPLICA_URLS', '').split(',') if url.strip()]
+    app.config['READ_YOUR_WRITES_WINDOW'] = float(os.environ.get('READ_YOUR_WRITES_WINDOW', 5))
+    
+    # Signed access tokens. Without a SECRET_KEY a random one is generated, which
+    # invalidates tokens on restart and differs between workers unless the app is
+    # preloaded before forking; set it in production.
+    # AUTH_ALLOW_USER_ID keeps accepting the raw user_id/follower_id parameters
+    # from clients that don't send a token yet (verified with a user lookup).
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
+    app.config['AUTH_TOKEN_TTL'] = int(os.environ.get('AUTH_TOKEN_TTL', 12 * 3600))
+    app.config['AUTH_ALLOW_USER_ID'] = env_flag('AUTH_ALLOW_USER_ID', 'true')
+    
+    # Per-request SQL counts and timings: /metrics, Server-Timing headers and
+    # optional N+1 / slow query logging (both disabled when unset)
+    app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 0)) or None
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 0)) or None
+    
+    # Home timelines are precomputed per follower (fan-out on write). Murmurs from
+    # accounts with more followers than the threshold are not fanned out; they are
+    # merged into the cached timeline at read time instead.
+    app.config['TIMELINE_MAX_LENGTH'] = int(os.environ.get('TIMELINE_MAX_LENGTH', 800))
+    app.config['TIMELINE_MAX_AGE'] = int(os.environ.get('TIMELINE_MAX_AGE', 60))
+    app.config['TIMELINE_CELEBRITY_THRESHOLD'] = int(os.environ.get('TIMELINE_CELEBRITY_THRESHOLD', 10000))
+    
+    # The typeahead index is per process: users registered or renamed through
+    # another worker appear after a background thread reloads it, every
+    # TYPEAHEAD_MAX_AGE seconds (0 = only on first use)
+    app.config['TYPEAHEAD_MAX_AGE'] = int(os.environ.get('TYPEAHEAD_MAX_AGE', 60))
+    
+    # Uploaded media is stored on disk by content hash; rows only keep a short URL
+    app.config['BLOB_STORAGE_PATH'] = os.environ.get('BLOB_STORAGE_PATH', os.path.join(app.instance_path, 'blobs'))
+    
+    # Serialized responses of hot read routes, invalidated by tag from the write routes.
+    # The cache is per process and a write only invalidates the worker that
+    # handled it, so other workers may serve the pre-write body (and 304s against
+    # it) for up to RESPONSE_CACHE_TTL seconds. The writer skips the cache for
+    # that long (see mark_recent_write), so they always see their own writes.
+    app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 30))
+    app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+    app.config['RESPONSE_CACHE_MAX_BYTES'] = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    app.config['RESPONSE_CACHE_FEED_PAGES'] = int(os.environ.get('RESPONSE_CACHE_FEED_PAGES', 3))
+    
+    # Optional write-behind for murmur like counters: increments are coalesced in
+    # memory and flushed every LIKE_COUNTER_FLUSH_INTERVAL seconds, so a viral
+    # murmur's row is updated once per interval instead of once per like
+    app.config['LIKE_COUNTER_WRITE_BEHIND'] = env_flag('LIKE_COUNTER_WRITE_BEHIND')
+    app.config['LIKE_COUNTER_FLUSH_INTERVAL'] = float(os.environ.get('LIKE_COUNTER_FLUSH_INTERVAL', 1.0))
+    
+    # Live updates over Server-Sent Events, fanned out in-process from the write
+    # routes. Each stream buffers at most SSE_QUEUE_SIZE events; a client that
+    # falls further behind is told to reset. Idle streams get a comment line every
+    # SSE_HEARTBEAT seconds so dead connections are noticed.
+    app.config['SSE_QUEUE_SIZE'] = int(os.environ.get('SSE_QUEUE_SIZE', 100))
+    app.config['SSE_HEARTBEAT'] = float(os.environ.get('SSE_HEARTBEAT', 15))
+    
+    # Trending murmurs: likes lose half their weight every TRENDING_HALF_LIFE
+    # seconds and the top TRENDING_CAPACITY murmurs are kept in memory. Each
+    # worker only sees its own likes, so a background thread rebuilds the
+    # ranking from the likes table every TRENDING_REBUILD_INTERVAL seconds
+    # (0 = only on first use) and shares it with the other workers through
+    # TRENDING_SNAPSHOT_PATH, which `flask rebuild-trending` also writes.
+    app.config['TRENDING_HALF_LIFE'] = float(os.environ.get('TRENDING_HALF_LIFE', 6 * 3600))
+    app.config['TRENDING_CAPACITY'] = int(os.environ.get('TRENDING_CAPACITY', 1000))
+    app.config['TRENDING_REBUILD_INTERVAL'] = float(os.environ.get('TRENDING_REBUILD_INTERVAL', 600))
+    app.config['TRENDING_SNAPSHOT_PATH'] = os.environ.get(
+        'TRENDING_SNAPSHOT_PATH', os.path.join(app.instance_path, 'trending.json')
+    )
+    
+    # JSON encoder for jsonify and request bodies: 'orjson' (stdlib if it isn't
+    # installed) or 'stdlib'
+    app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', 'orjson')
+    
+    # Compression of responses of at least COMPRESSION_MIN_SIZE bytes, with brotli
+    # or gzip as the client accepts. Turn it off when a proxy in front does it.
+    app.config['COMPRESSION_ENABLED'] = env_flag('COMPRESSION_ENABLED', 'true')
+    app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # Rows fetched per round trip (and held in memory) by the NDJSON export
+    app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+def engine_options(config):
+    options = {
+        'pool_pre_ping': config['DATABASE_POOL_PRE_PING'],
+        'pool_recycle': config['DATABASE_POOL_RECYCLE'],
+    }
+    for option, key in (('pool_size', 'DATABASE_POOL_SIZE'), ('max_overflow', 'DATABASE_MAX_OVERFLOW'),
+                        ('pool_timeout', 'DATABASE_POOL_TIMEOUT')):
+        if config[key] is not None:
+            options[option] = config[key]
+    return options
+
+def create_app(config=None):
+    # Build a configured app. Nothing here touches the database: engines connect
+    # lazily, and the schema is created by `flask init-db` (or brought up to date
+    # by `flask db-upgrade`), never at startup.
+    app = Flask(__name__)
+    load_config(app)
+    if config:
+        app.config.update(config)
+    
+    app.json = provider_class(app.config['JSON_PROVIDER'])(app)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'replica_{index}': url for index, url in enumerate(app.config['SQLALCHEMY_REPLICA_URLS'])
+    }
+    
+    CORS(app)  # Enable CORS for all routes
+    db.init_app(app)
+    
+    services = app.extensions['murmur'] = {
+        'timeline_store': InMemoryTimelineStore(
+            max_length=app.config['TIMELINE_MAX_LENGTH'],
+            max_age=app.config['TIMELINE_MAX_AGE']
+        ),
+        'blob_store': LocalBlobStore(app.config['BLOB_STORAGE_PATH']),
+        'response_cache': LRUCache(
+            max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+            max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+            default_ttl=app.config['RESPONSE_CACHE_TTL']
+        ),
+        'like_counter_buffer': None,
+        'event_broker': EventBroker(max_queue=app.config['SSE_QUEUE_SIZE']),
+        'token_signer': TokenSigner(app.config['SECRET_KEY'], ttl=app.config['AUTH_TOKEN_TTL']),
+        'replica_router': ReplicaRouter(app.config['SQLALCHEMY_BINDS'], sticky_window=app.config['READ_YOUR_WRITES_WINDOW']),
+        # Username/name prefix index for typeahead, loaded on first use
+        'typeahead_index': PrefixIndex(),
+        'typeahead_refresher': None,
+        # Hottest murmurs by decayed like velocity, loaded on first use
+        'trending_index': TrendingIndex(
+            half_life=app.config['TRENDING_HALF_LIFE'],
+            capacity=app.config['TRENDING_CAPACITY']
+        ),
+        'trending_refresher': None,
+        'search_backend': None,
+        'compressor': None,
+    }
+    services['typeahead_refresher'] = PrefixIndexRefresher(
+        services['typeahead_index'], partial(load_typeahead_records, app),
+        interval=app.config['TYPEAHEAD_MAX_AGE']
+    )
+    atexit.register(services['typeahead_refresher'].stop)
+    services['trending_refresher'] = TrendingRefresher(
+        services['trending_index'], partial(rebuild_trending, app),
+        snapshot_path=app.config['TRENDING_SNAPSHOT_PATH'],
+        interval=app.config['TRENDING_REBUILD_INTERVAL']
+    )
+    atexit.register(services['trending_refresher'].stop)
+    if app.config['LIKE_COUNTER_WRITE_BEHIND']:
+        buffer = services['like_counter_buffer'] = CounterBuffer(
+            partial(flush_like_counts, app), interval=app.config['LIKE_COUNTER_FLUSH_INTERVAL']
+        )
+        atexit.register(buffer.stop)
+    
+    # Registered first so it runs after every other after_request hook
+    if app.config['COMPRESSION_ENABLED']:
+        compressor = services['compressor'] = ResponseCompressor(
+            min_size=app.config['COMPRESSION_MIN_SIZE'],
+            gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY']
+        )
+        compressor.init_app(app)
+    
+    instrumentation = services['instrumentation'] = Instrumentation(
+        n_plus_one_threshold=app.config['N_PLUS_ONE_THRESHOLD'],
+        slow_query_threshold=app.config['SLOW_QUERY_THRESHOLD_MS'] and app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+    )
+    with app.app_context():
+        instrumentation.init_app(app, {bind_key or 'primary': engine for bind_key, engine in db.engines.items()})
+    
+    app.register_blueprint(api)
+    return app
+
+def init_db():
+    # Create missing tables, then apply and record the migrations (which also
+    # build what create_all() can't, such as the SQLite full-text table).
+    # Primary only: replicas get the schema through replication.
+    db.create_all(bind_key=None)
+    return migrations.upgrade(db.engine)
 
 # Models
 class User(db.Model):
@@ -27,10 +268,15 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
     bio = db.Column(db.String(500))
-    profile_image = db.Column(db.String(500))
+    profile_image = db.Column(db.String(500))  # URL, see blob_url()
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized counters, maintained by the write routes (see `flask repair-counters`)
+    followers_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    murmurs_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     murmurs = db.relationship('Murmur', backref='author', lazy=True, cascade="all, delete-orphan")
     
@@ -40,8 +286,8 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_counts=False):
+        user_data = {
             'id': self.id,
             'name': self.name,
             'username': self.username,
@@ -51,6 +297,13 @@ class User(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+        
+        if include_counts:
+            user_data['followers_count'] = self.followers_count
+            user_data['following_count'] = self.following_count
+            user_data['murmurs_count'] = self.murmurs_count
+        
+        return user_data
 
 class Murmur(db.Model):
     __tablename__ = 'murmurs'
@@ -58,16 +311,21 @@ class Murmur(db.Model):
     content = db.Column(db.String(280), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     media_type = db.Column(db.String(20))  # 'image', 'video', 'audio', or null
-    media_url = db.Column(db.Text)  # URL or base64 data
+    media_url = db.Column(db.Text)  # URL (inline base64 data is moved to the blob store)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized counter, maintained by like_murmur/unlike_murmur
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relationships
     likes = db.relationship('Like', backref='murmur', lazy=True, cascade="all, delete-orphan")
     
-    def to_dict(self):
-        user = User.query.get(self.user_id)
-        user_data = user.to_dict() if user else None
+    def to_dict(self, author=None):
+        # Callers serializing many murmurs pass preloaded authors (see serialize_murmurs)
+        if author is None:
+            author = User.query.get(self.user_id)
+        user_data = author.to_dict() if author else None
         
         return {
             'id': self.id,
@@ -76,7 +334,7 @@ class Murmur(db.Model):
             'author': user_data,
             'media_type': self.media_type,
             'media_url': self.media_url,
-            'likes_count': Like.query.filter_by(murmur_id=self.id).count(),
+            'likes_count': self.likes_count,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -101,12 +359,778 @@ class Follow(db.Model):
     # Add unique constraint to prevent duplicate follows
     __table_args__ = (db.UniqueConstraint('follower_id', 'followed_id', name='unique_follower_followed'),)
 
-# Create all tables
-with app.app_context():
-    db.create_all()
+# Indexes for the hot query paths. Existing databases get them from
+# migrations.py (`flask db-upgrade`), which must be kept in sync with these.
+db.Index('ix_murmurs_user_id_created_at', Murmur.user_id, Murmur.created_at.desc(), Murmur.id.desc())
+db.Index('ix_murmurs_created_at_id', Murmur.created_at.desc(), Murmur.id.desc())
+db.Index('ix_follows_followed_id_follower_id', Follow.followed_id, Follow.follower_id)
+db.Index('ix_follows_followed_id_created_at', Follow.followed_id, Follow.created_at.desc(), Follow.id.desc())
+db.Index('ix_follows_follower_id_created_at', Follow.follower_id, Follow.created_at.desc(), Follow.id.desc())
+db.Index('ix_likes_murmur_id_user_id', Like.murmur_id, Like.user_id)
+db.Index('ix_likes_created_at_murmur_id', Like.created_at, Like.murmur_id)
+
+def serialize_murmurs(murmurs):
+    # Serialize a page of murmurs with a single query for all of the authors,
+    # regardless of the page size (like counts are read from the counter column)
+    if not murmurs:
+        return []
+    
+    user_ids = {murmur.user_id for murmur in murmurs}
+    authors = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+    
+    cache_tags(*(f'murmur:{murmur.id}' for murmur in murmurs), *(f'user:{user_id}' for user_id in user_ids))
+    return [murmur.to_dict(author=authors.get(murmur.user_id)) for murmur in murmurs]
+
+# Upper bound on ids per /api/murmurs/batch request
+MAX_BATCH_IDS = 100
+
+# Author fields returned in the `users` map of compact responses by default
+COMPACT_USER_FIELDS = ('id', 'name', 'username', 'profile_image')
+
+def requested_fields(name):
+    # Comma-separated sparse fieldset from the query string, or None
+    value = request.args.get(name)
+    if not value:
+        return None
+    return [field.strip() for field in value.split(',') if field.strip()]
+
+def pick_fields(data, fields):
+    # 'id' is always kept so clients can key what they receive
+    return {key: value for key, value in data.items() if key == 'id' or key in fields}
+
+def annotate_liked_by_viewer(murmur_list, viewer_id):
+    # Flag the murmurs the viewer has liked with a single query for the whole list
+    murmur_ids = [murmur_data['id'] for murmur_data in murmur_list]
+    liked = {murmur_id for (murmur_id,) in db.session.query(Like.murmur_id).filter(
+        Like.user_id == viewer_id,
+        Like.murmur_id.in_(murmur_ids)
+    )}
+    for murmur_data in murmur_list:
+        murmur_data['liked_by_viewer'] = murmur_data['id'] in liked
+    return murmur_list
+
+def murmur_list_payload(murmurs):
+    # The `murmurs` part of a list response, shaped by the query string:
+    #   ?fields=id,content,...  only these murmur fields
+    #   ?format=compact         authors moved to a `users` map keyed by id, each
+    #                           author listed once; murmurs refer to it by user_id
+    #   ?user_fields=...        fields of the users in that map
+    #   ?viewer_id=...          adds liked_by_viewer to every murmur
+    murmur_list = serialize_murmurs(murmurs)
+    fields = requested_fields('fields')
+    viewer_id = request.args.get('viewer_id', type=int)
+    
+    if request.args.get('format') != 'compact':
+        if fields:
+            murmur_list = [pick_fields(murmur_data, fields) for murmur_data in murmur_list]
+        if viewer_id and murmur_list:
+            annotate_liked_by_viewer(murmur_list, viewer_id)
+        return {'murmurs': murmur_list}
+    
+    user_fields = requested_fields('user_fields') or COMPACT_USER_FIELDS
+    users = {}
+    for murmur_data in murmur_list:
+        author = murmur_data.pop('author')
+        if author and str(author['id']) not in users:
+            users[str(author['id'])] = pick_fields(author, user_fields)
+    
+    if fields:
+        murmur_list = [pick_fields(murmur_data, [*fields, 'user_id']) for murmur_data in murmur_list]
+    if viewer_id and murmur_list:
+        annotate_liked_by_viewer(murmur_list, viewer_id)
+    
+    return {'murmurs': murmur_list, 'users': users}
+
+def serialize_users(users, viewer_id=None):
+    # Users with their counters and, given a viewer, whether the viewer follows
+    # each of them and whether they follow the viewer: one batched query for
+    # the whole list
+    user_list = [user.to_dict(include_counts=True) for user in users]
+    if viewer_id is None or not users:
+        return user_list
+    
+    user_ids = [user.id for user in users]
+    rows = db.session.query(Follow.follower_id, Follow.followed_id).filter(db.or_(
+        db.and_(Follow.follower_id == viewer_id, Follow.followed_id.in_(user_ids)),
+        db.and_(Follow.followed_id == viewer_id, Follow.follower_id.in_(user_ids))
+    )).all()
+    followed_by_viewer = {followed_id for follower_id, followed_id in rows if follower_id == viewer_id}
+    follows_viewer = {follower_id for follower_id, followed_id in rows if followed_id == viewer_id}
+    
+    for user_data in user_list:
+        user_data['followed_by_viewer'] = user_data['id'] in followed_by_viewer
+        user_data['follows_viewer'] = user_data['id'] in follows_viewer
+    
+    return user_list
+
+def follow_listing(user_id, listing):
+    # Users on one side of a user's follow edges, joined in a single query:
+    # 'followers' of user_id or the users user_id is 'following'
+    if listing == 'followers':
+        join_on, filter_on = Follow.follower_id, Follow.followed_id
+    else:
+        join_on, filter_on = Follow.followed_id, Follow.follower_id
+    
+    return db.session.query(User, Follow.created_at, Follow.id).join(
+        Follow, join_on == User.id
+    ).filter(filter_on == user_id)
+
+def list_follow_users(user_id, listing):
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    viewer_id = request.args.get('viewer_id', type=int)
+    
+    # Check if user exists
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    query = follow_listing(user_id, listing)
+    
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        # .paginate() answers 404 to a page size below 1; so does cursor mode
+        if per_page < 1:
+            abort(404)
+        try:
+            rows, next_cursor = keyset_paginate(query, Follow.created_at, Follow.id, cursor, per_page)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        users = [row.User for row in rows]
+        return jsonify({listing: serialize_users(users, viewer_id), 'next_cursor': next_cursor}), 200
+    
+    # Oldest follow first, as the listings have always been returned
+    follows = query.order_by(Follow.id).paginate(page=page, per_page=per_page)
+    users = [row.User for row in follows.items]
+    
+    return jsonify({
+        listing: serialize_users(users, viewer_id),
+        'total': follows.total,
+        'pages': follows.pages,
+        'current_page': page
+    }), 200
+
+def cache_tags(*tags):
+    # Record which records the current response was built from, so a cached
+    # copy can be invalidated when any of them changes
+    g.setdefault('cache_tags', set()).update(tags)
+
+def cached_route(when=None):
+    # Cache successful responses of a GET route, keyed by path and query string.
+    # `when` can veto caching for a request (e.g. deep feed pages). Every response
+    # carries an ETag, and a matching If-None-Match is answered with 304. Entries
+    # also keep a compressed copy of the body, served to clients that accept it.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Callers who wrote recently skip the cache both ways: an entry,
+            # here or in another worker, may predate their write
+            recent_write = g.get('read_primary') or wrote_within(current_app.config['RESPONSE_CACHE_TTL'])
+            if (when is not None and not when()) or recent_write:
+                return view(*args, **kwargs)
+            
+            compressor = current_app.extensions['murmur']['compressor']
+            key = f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+            entry = response_cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                
+                body = response.get_data()
+                encoded = compressor.precompress(body) if compressor else {}
+                entry = CachedResponse(body, hashlib.sha1(body).hexdigest(), encoded)
+                # A replica read shortly after a write may not include it yet
+                tags = g.get('cache_tags', ())
+                if not (g.get('db_replica') and replica_router.recently_invalidated(tags)):
+                    response_cache.set(key, entry, tags=tags)
+            
+            encoding = choose_encoding(request.accept_encodings, entry.encoded)
+            if encoding:
+                response = current_app.response_class(entry.encoded[encoding], mimetype='application/json')
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                response.set_etag(entry.etag, weak=True)
+            else:
+                response = current_app.response_class(entry.body, mimetype='application/json')
+                response.set_etag(entry.etag)
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+def invalidate_cache(*tags):
+    response_cache.invalidate_tags(tags)
+    replica_router.mark_invalidated(tags)
+
+def search_backend():
+    # FTS5 on SQLite, tsvector/pg_trgm on Postgres, plain LIKE if the index
+    # hasn't been created yet (see migration 0003)
+    services = current_app.extensions['murmur']
+    if services['search_backend'] is None:
+        services['search_backend'] = search_backend_for(db.session.connection())
+    return services['search_backend']
+
+def typeahead_record(user):
+    return {'id': user.id, 'username': user.username, 'name': user.name, 'profile_image': user.profile_image}
+
+def load_typeahead_records(app):
+    # Runs on the typeahead refresher's thread, so it brings its own app context
+    with app.app_context():
+        rows = db.session.query(User.id, User.username, User.name, User.profile_image).all()
+        return [typeahead_record(row) for row in rows]
+
+def index_user(user):
+    # Called before commit so the search index changes with the user row
+    db.session.flush()
+    search_backend().index_user(db.session, user)
+
+def refresh_typeahead(user):
+    if typeahead_index.loaded:
+        typeahead_index.add(typeahead_record(user))
+
+def insert_ignore(model):
+    # INSERT ... ON CONFLICT DO NOTHING for the dialects that support it
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return None
+
+def insert_like(user_id, murmur_id):
+    # Single-statement idempotent like: INSERT ... SELECT from murmurs, so a
+    # missing murmur inserts nothing, and ON CONFLICT DO NOTHING so a repeated
+    # or racing like is a no-op instead of an IntegrityError. Returns True if
+    # a row was inserted.
+    source = db.select(db.literal(user_id), Murmur.id, db.literal(datetime.utcnow())).where(Murmur.id == murmur_id)
+    stmt = insert_ignore(Like)
+    if stmt is not None:
+        result = db.session.execute(stmt.from_select([Like.user_id, Like.murmur_id, Like.created_at], source))
+        return result.rowcount == 1
+    
+    # Other databases: plain insert guarded by a savepoint
+    try:
+        with db.session.begin_nested():
+            result = db.session.execute(
+                db.insert(Like).from_select([Like.user_id, Like.murmur_id, Like.created_at], source)
+            )
+        return result.rowcount == 1
+    except db.exc.IntegrityError:
+        return False
+
+def add_to_likes_count(murmur_id, amount):
+    # Apply a like count change and return the stored count (None if the murmur
+    # doesn't exist). With write-behind enabled nothing is written: the count is
+    # the stored one plus the pending deltas, and publish_likes_count buffers
+    # the change once the like itself is committed.
+    if current_app.config['LIKE_COUNTER_WRITE_BEHIND']:
+        stored = db.session.query(Murmur.likes_count).filter_by(id=murmur_id).scalar()
+        return None if stored is None else stored + like_counter_buffer.pending(murmur_id) + amount
+    
+    if not amount:
+        return db.session.query(Murmur.likes_count).filter_by(id=murmur_id).scalar()
+    
+    stmt = db.update(Murmur).where(Murmur.id == murmur_id).values(
+        likes_count=Murmur.likes_count + amount,
+        updated_at=Murmur.updated_at
+    ).execution_options(synchronize_session=False)
+    if db.engine.dialect.update_returning:
+        return db.session.execute(stmt.returning(Murmur.likes_count)).scalar()
+    
+    db.session.execute(stmt)
+    return db.session.query(Murmur.likes_count).filter_by(id=murmur_id).scalar()
+
+def publish_likes_count(murmur_id, amount, likes_count):
+    # Called after the like/unlike is committed, so a failed commit never reaches
+    # the write-behind buffer. With write-behind the cache is invalidated when
+    # the buffer flushes.
+    if current_app.config['LIKE_COUNTER_WRITE_BEHIND']:
+        like_counter_buffer.add(murmur_id, amount)
+    else:
+        invalidate_cache(f'murmur:{murmur_id}')
+    event_broker.publish(f'murmur:{murmur_id}', 'likes', {'murmur_id': murmur_id, 'likes_count': likes_count})
+
+def flush_like_counts(app, deltas):
+    # Write-behind flush (runs on the buffer's thread): one executemany UPDATE
+    # for every buffered murmur
+    with app.app_context():
+        db.session.execute(
+            db.text('UPDATE murmurs SET likes_count = likes_count + :delta WHERE id = :id'),
+            [{'id': murmur_id, 'delta': delta} for murmur_id, delta in deltas.items()]
+        )
+        db.session.commit()
+        invalidate_cache(*(f'murmur:{murmur_id}' for murmur_id in deltas))
+
+def rebuild_trending(app):
+    # Replay the likes that still carry weight into a fresh ranking; runs on
+    # the trending refresher's thread, so it brings its own app context
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(seconds=trending_index.lookback)
+        likes = db.session.query(Like.murmur_id, Like.created_at).filter(Like.created_at >= cutoff)
+        trending_index.load(likes.yield_per(5000))
+
+def record_trending(murmur_id, amount):
+    # Not loaded yet: the likes are picked up when the index is built
+    if trending_index.loaded_at is not None:
+        trending_index.record(murmur_id, amount)
+
+def bearer_token(query_param=None):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token.strip():
+        return token.strip()
+    # Only for clients that can't set headers (EventSource)
+    if query_param:
+        return request.args.get(query_param) or None
+    return None
+
+def legacy_user_id(field, source):
+    if source == 'args':
+        value = request.args.get(field)
+    elif source == 'form':
+        value = request.form.get(field)
+    else:
+        value = (request.get_json(silent=True) or {}).get(field)
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def auth_required(legacy_field='user_id', legacy_source='json', token_param=None):
+    # Injects the caller's id as current_user_id. A bearer token is verified in
+    # memory without touching the database; the legacy id parameter (named
+    # legacy_field, read from the JSON body, query string or form) still works
+    # while AUTH_ALLOW_USER_ID is on, but costs a lookup to check the user.
+    # Routes passing legacy_field=None accept tokens only.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            token = bearer_token(token_param)
+            if token is not None:
+                try:
+                    current_user_id = token_signer.user_id(token)
+                except InvalidToken as e:
+                    return jsonify({'error': str(e)}), 401
+            else:
+                current_user_id = None
+                if legacy_field and current_app.config['AUTH_ALLOW_USER_ID']:
+                    current_user_id = legacy_user_id(legacy_field, legacy_source)
+                if not current_user_id:
+                    return jsonify({'error': 'Authentication required'}), 401
+                if db.session.get(User, current_user_id) is None:
+                    return jsonify({'error': 'User not found'}), 404
+            
+            g.current_user_id = current_user_id
+            return view(*args, current_user_id=current_user_id, **kwargs)
+        return wrapper
+    return decorator
+
+# Set on every successful write: the time of the caller's last write, which
+# keeps their reads off replicas and response caches that may predate it
+LAST_WRITE_COOKIE = 'last_write_at'
+
+def wrote_within(seconds):
+    last_write = request.cookies.get(LAST_WRITE_COOKIE, '')
+    return last_write.isdigit() and int(last_write) + seconds > time.time()
+
+def request_user_id():
+    # Best-effort identity of the caller of a read route, for read-your-writes
+    if g.get('current_user_id'):
+        return g.current_user_id
+    token = bearer_token()
+    if token is not None:
+        try:
+            return token_signer.user_id(token)
+        except InvalidToken:
+            return None
+    return request.args.get('viewer_id', type=int)
+
+def read_replica(view):
+    # Run the view's queries on a read replica, unless none is configured or
+    # the caller wrote recently (per-process writer map, or the cookie set on
+    # write responses for browsers hitting another worker)
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if replica_router.replicas:
+            recent_write = wrote_within(current_app.config['READ_YOUR_WRITES_WINDOW'])
+            if recent_write or replica_router.is_sticky(request_user_id()):
+                g.read_primary = True
+            else:
+                g.db_replica = replica_router.choose()
+        return view(*args, **kwargs)
+    return wrapper
+
+@api.after_app_request
+def mark_recent_write(response):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+        if replica_router.replicas and g.get('current_user_id'):
+            replica_router.mark_write(g.current_user_id)
+        # Kept for as long as either a replica or another worker's cache may be stale
+        window = max(current_app.config['READ_YOUR_WRITES_WINDOW'], current_app.config['RESPONSE_CACHE_TTL'])
+        response.set_cookie(LAST_WRITE_COOKIE, str(math.floor(time.time())),
+                            max_age=math.ceil(window), httponly=True, samesite='Lax')
+    return response
+
+def auth_payload(user):
+    token, expires_at = token_signer.issue(user.id)
+    return {'token': token, 'token_type': 'Bearer', 'expires_at': expires_at, 'user': user.to_dict()}
+
+def increment_counter(model, row_id, column, amount=1):
+    # Atomic `column = column + amount` so concurrent writers don't lose updates.
+    # updated_at is pinned so counter changes don't look like content edits.
+    model.query.filter_by(id=row_id).update(
+        {column: column + amount, model.updated_at: model.updated_at},
+        synchronize_session=False
+    )
+
+def repair_counters():
+    # Recompute every denormalized counter in bulk, touching only drifted rows.
+    # Returns the number of rows fixed per counter.
+    counters = [
+        (User, User.followers_count, db.select(db.func.count(Follow.id)).where(Follow.followed_id == User.id)),
+        (User, User.following_count, db.select(db.func.count(Follow.id)).where(Follow.follower_id == User.id)),
+        (User, User.murmurs_count, db.select(db.func.count(Murmur.id)).where(Murmur.user_id == User.id)),
+        (Murmur, Murmur.likes_count, db.select(db.func.count(Like.id)).where(Like.murmur_id == Murmur.id)),
+    ]
+    
+    fixed = {}
+    for model, column, count_query in counters:
+        actual = count_query.scalar_subquery()
+        result = db.session.execute(
+            db.update(model).where(column != actual).values({column: actual, model.updated_at: model.updated_at}),
+            execution_options={'synchronize_session': False}
+        )
+        fixed[f'{model.__tablename__}.{column.key}'] = result.rowcount
+    
+    db.session.commit()
+    return fixed
+
+def encode_cursor(created_at, row_id):
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{row_id}'.encode()).decode()
+
+def decode_cursor(cursor):
+    # Raises ValueError for anything that wasn't produced by encode_cursor
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def encode_trending_cursor(rank, murmur_id):
+    return base64.urlsafe_b64encode(f'{rank!r}|{murmur_id}'.encode()).decode()
+
+def decode_trending_cursor(cursor):
+    try:
+        rank, murmur_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return float(rank), int(murmur_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def keyset_paginate(query, created_col, id_col, cursor, per_page):
+    # Seek pagination over (created_at, id) descending. Unlike .paginate() there
+    # is no OFFSET and no COUNT(*), so every page costs the same at any depth.
+    # An empty cursor returns the first page; next_cursor is None on the last one.
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            created_col < created_at,
+            db.and_(created_col == created_at, id_col < row_id)
+        ))
+    
+    # Fetch one extra row to find out whether there is a next page
+    rows = query.order_by(created_col.desc(), id_col.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    
+    return items, next_cursor
+
+def load_murmurs(murmur_ids):
+    # Fetch murmurs by id, keeping the order of murmur_ids and skipping deleted ones
+    murmurs = {murmur.id: murmur for murmur in Murmur.query.filter(Murmur.id.in_(murmur_ids)).all()}
+    return [murmurs[murmur_id] for murmur_id in murmur_ids if murmur_id in murmurs]
+
+def timeline_filter(user_id):
+    # Murmurs from the user and everyone they follow, as a subquery rather than a
+    # materialized IN (...) list of followed ids
+    followed_ids = db.select(Follow.followed_id).where(Follow.follower_id == user_id)
+    return db.or_(Murmur.user_id == user_id, Murmur.user_id.in_(followed_ids))
+
+def celebrity_followed_ids(user_id):
+    threshold = current_app.config['TIMELINE_CELEBRITY_THRESHOLD']
+    rows = db.session.query(Follow.followed_id).join(User, User.id == Follow.followed_id).filter(
+        Follow.follower_id == user_id,
+        Follow.followed_id != user_id,
+        User.followers_count > threshold
+    ).all()
+    return [followed_id for (followed_id,) in rows]
+
+def build_timeline(user_id):
+    # Rebuild a cached timeline from the database, leaving out celebrity accounts
+    limit = current_app.config['TIMELINE_MAX_LENGTH']
+    threshold = current_app.config['TIMELINE_CELEBRITY_THRESHOLD']
+    followed_ids = db.select(Follow.followed_id).join(User, User.id == Follow.followed_id).where(
+        Follow.follower_id == user_id,
+        User.followers_count <= threshold
+    )
+    rows = db.session.query(Murmur.created_at, Murmur.id).filter(
+        db.or_(Murmur.user_id == user_id, Murmur.user_id.in_(followed_ids))
+    ).order_by(Murmur.created_at.desc(), Murmur.id.desc()).limit(limit).all()
+    
+    entries = [tuple(row) for row in rows]
+    complete = len(entries) < limit
+    timeline_store.set(user_id, entries, complete)
+    return entries, complete
+
+def timeline_entries(user_id, limit, before=None):
+    # Newest-first (created_at, id) entries of a user's home timeline, older than
+    # `before` if given. Returns None when the request reaches past the cached
+    # window, in which case the caller falls back to querying murmurs directly.
+    cached = timeline_store.get(user_id)
+    entries, complete = cached if cached is not None else build_timeline(user_id)
+    if before is not None:
+        entries = [entry for entry in entries if entry < before]
+    if len(entries) < limit and not complete:
+        return None
+    
+    celebrity_ids = celebrity_followed_ids(user_id)
+    if celebrity_ids:
+        query = db.session.query(Murmur.created_at, Murmur.id).filter(Murmur.user_id.in_(celebrity_ids))
+        if before is not None:
+            query = query.filter(db.or_(
+                Murmur.created_at < before[0],
+                db.and_(Murmur.created_at == before[0], Murmur.id < before[1])
+            ))
+        rows = query.order_by(Murmur.created_at.desc(), Murmur.id.desc()).limit(limit).all()
+        entries = sorted(set(entries) | {tuple(row) for row in rows}, reverse=True)
+    
+    return entries[:limit]
+
+def fan_out_murmur(murmur, author):
+    # Push a new murmur onto the cached timelines of its author and followers
+    entry = (murmur.created_at, murmur.id)
+    timeline_store.push([author.id], entry)
+    
+    if author.followers_count > current_app.config['TIMELINE_CELEBRITY_THRESHOLD']:
+        return
+    
+    follower_ids = [follower_id for (follower_id,) in db.session.query(Follow.follower_id).filter_by(followed_id=author.id)]
+    timeline_store.push(follower_ids, entry)
+
+def retract_murmur(murmur_id, author_id):
+    follower_ids = [follower_id for (follower_id,) in db.session.query(Follow.follower_id).filter_by(followed_id=author_id)]
+    timeline_store.remove(follower_ids + [author_id], murmur_id)
+
+def blob_url(digest, mimetype):
+    # The extension fixes the type the blob is served as (see get_blob)
+    return url_for('api.get_blob', name=f'{digest}{media_extension(mimetype)}')
+
+def store_data_url(value, kinds=('image/', 'video/', 'audio/')):
+    # Move an inline base64 data URL into the blob store and return its URL.
+    # Anything else (regular URLs, None) is returned unchanged. Raises
+    # ValueError for invalid base64 and for media types that aren't accepted.
+    if not is_data_url(value):
+        return value
+    
+    mimetype, data = decode_data_url(value)
+    if not mimetype.startswith(kinds):
+        raise ValueError(f'Unsupported media type {mimetype!r}')
+    media_extension(mimetype)  # checked before anything is written
+    return blob_url(blob_store.save_bytes(data), mimetype)
+
+def migrate_inline_media(batch_size=100):
+    # Move base64 data URLs out of users.profile_image and murmurs.media_url,
+    # committing one batch at a time. Returns (migrated, skipped) per column.
+    results = {}
+    for column in (User.profile_image, Murmur.media_url):
+        model = column.class_
+        migrated = skipped = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, column).filter(
+                model.id > last_id,
+                column.like('data:%')
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            
+            for row_id, value in rows:
+                try:
+                    url = store_data_url(value)
+                except ValueError:
+                    skipped += 1
+                    continue
+                
+                db.session.execute(
+                    db.update(model).where(model.id == row_id).values({column: url, model.updated_at: model.updated_at})
+                )
+                migrated += 1
+            
+            db.session.commit()
+            last_id = rows[-1][0]
+        
+        results[f'{model.__tablename__}.{column.key}'] = (migrated, skipped)
+    
+    return results
+
+def export_queries(user_id):
+    # (record type, statement) for everything exported for a user. Plain column
+    # selects, so rows never enter the session's identity map.
+    return [
+        ('murmur', db.select(
+            Murmur.id, Murmur.content, Murmur.media_type, Murmur.media_url,
+            Murmur.likes_count, Murmur.created_at, Murmur.updated_at
+        ).where(Murmur.user_id == user_id).order_by(Murmur.id)),
+        ('like', db.select(Like.murmur_id, Like.created_at).where(Like.user_id == user_id).order_by(Like.id)),
+        ('following', db.select(Follow.followed_id.label('user_id'), Follow.created_at).where(
+            Follow.follower_id == user_id).order_by(Follow.id)),
+        ('follower', db.select(Follow.follower_id.label('user_id'), Follow.created_at).where(
+            Follow.followed_id == user_id).order_by(Follow.id)),
+    ]
+
+def ndjson_line(record):
+    return json.dumps(record, default=lambda value: value.isoformat(), separators=(',', ':')) + '\n'
+
+def export_user_chunks(user, batch_size):
+    # NDJSON export of a user: the profile first, then one line per murmur, like
+    # and follow edge. Each query streams with a server-side cursor (yield_per),
+    # and each chunk is one batch of lines, so memory stays at one batch.
+    yield ndjson_line({'type': 'user', **user.to_dict(include_counts=True)}).encode()
+    
+    for record_type, stmt in export_queries(user.id):
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield ''.join(ndjson_line({'type': record_type, **row._asdict()}) for row in rows).encode()
+
+def gzip_chunks(chunks):
+    # Compress a stream of byte chunks into one gzip member as they are produced
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@api.cli.command('export-user')
+@click.argument('user_id', type=int)
+@click.option('--output', '-o', default='-', show_default=True, help='File to write, - for stdout.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('--batch-size', default=None, type=int, help='Rows per fetch (default EXPORT_BATCH_SIZE).')
+def export_user_command(user_id, output, compress, batch_size):
+    """Export a user's profile, murmurs, likes and follows as NDJSON."""
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise click.ClickException(f'User {user_id} not found')
+    
+    chunks = export_user_chunks(user, batch_size or current_app.config['EXPORT_BATCH_SIZE'])
+    if compress:
+        chunks = gzip_chunks(chunks)
+    with click.open_file(output, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+@api.cli.command('migrate-media')
+@click.option('--batch-size', default=100, show_default=True, help='Rows per transaction.')
+def migrate_media_command(batch_size):
+    """Move inline base64 images and media into the blob store."""
+    # url_for() needs a request context to build the blob URLs
+    with current_app.test_request_context():
+        results = migrate_inline_media(batch_size)
+    
+    for column, (migrated, skipped) in results.items():
+        print(f'{column}: {migrated} row(s) migrated, {skipped} skipped (invalid or unsupported data)')
+
+@api.cli.command('init-db')
+def init_db_command():
+    """Create the database schema (tables, indexes and search index)."""
+    applied = init_db()
+    print(f'Database initialized ({len(applied)} migration(s) recorded)')
+
+@api.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations (new columns and indexes)."""
+    applied = migrations.upgrade(db.engine)
+    for name in applied:
+        print(f'Applied {name}')
+    if not applied:
+        print('Database schema is up to date')
+
+@api.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Reindex all users for search (e.g. after a bulk import)."""
+    search_backend().rebuild(db.session)
+    db.session.commit()
+    print('Search index rebuilt')
+
+@api.cli.command('repair-counters')
+def repair_counters_command():
+    """Recompute drifted follower, following, murmur and like counters."""
+    for counter, rows in repair_counters().items():
+        print(f'{counter}: {rows} row(s) repaired')
+
+@api.cli.command('rebuild-trending')
+@click.option('--top', default=10, show_default=True, help='Number of murmurs to list.')
+def rebuild_trending_command(top):
+    """Build the trending ranking from recent likes and list the top murmurs.
+
+    The ranking is written to TRENDING_SNAPSHOT_PATH: workers starting up
+    serve it right away, and running workers load it within
+    TRENDING_REBUILD_INTERVAL seconds.
+    """
+    started = time.perf_counter()
+    trending_refresher.rebuild()
+    elapsed = time.perf_counter() - started
+    print(f'{len(trending_index)} murmur(s) ranked in {elapsed * 1000:.0f} ms')
+    
+    murmur_ids, _ = trending_index.page(limit=top)
+    for murmur in load_murmurs(murmur_ids):
+        print(f'{trending_index.score(murmur.id):10.2f}  #{murmur.id}  {murmur.content[:60]!r}')
+
+def hash_import_password(record):
+    # Migrated users normally bring their password_hash; plain passwords are
+    # hashed here, which is by far the slowest part of an import
+    if not record.get('password_hash') and record.get('password'):
+        record = {**record, 'password_hash': generate_password_hash(record['password'])}
+    return record
+
+@api.cli.command('import-data')
+@click.option('--users', type=click.Path(exists=True, dir_okay=False), help='Users file (id, name, username, email, password_hash or password, ...).')
+@click.option('--murmurs', type=click.Path(exists=True, dir_okay=False), help='Murmurs file (id, user_id, content, ...).')
+@click.option('--follows', type=click.Path(exists=True, dir_okay=False), help='Follows file (follower_id, followed_id, ...).')
+@click.option('--likes', type=click.Path(exists=True, dir_okay=False), help='Likes file (user_id, murmur_id, ...).')
+@click.option('--batch-size', default=5000, show_default=True, help='Rows per transaction.')
+@click.option('--checkpoint', default='import-checkpoint.json', show_default=True, help='Progress file used to resume.')
+@click.option('--skip-repair', is_flag=True, help="Don't recompute counters and the search index afterwards.")
+def import_data_command(users, murmurs, follows, likes, batch_size, checkpoint, skip_repair):
+    """Bulk load users, murmurs, follows and likes from NDJSON or CSV files."""
+    checkpoint = bulk_import.Checkpoint(checkpoint)
+    timestamps = {'created_at': datetime.utcnow, 'updated_at': datetime.utcnow}
+    counters = {'followers_count': 0, 'following_count': 0, 'murmurs_count': 0, 'likes_count': 0}
+    
+    # Parents before children, so foreign keys resolve
+    for model, path, prepare in ((User, users, hash_import_password), (Murmur, murmurs, None),
+                                 (Follow, follows, None), (Like, likes, None)):
+        if path is None:
+            continue
+        stats = bulk_import.import_file(
+            db.engine, model.__table__, path, batch_size=batch_size, checkpoint=checkpoint,
+            defaults={**timestamps, **counters}, prepare=prepare
+        )
+        print(f"{model.__tablename__}: {stats['read']} read, {stats['inserted']} inserted, "
+              f"{stats['rejected']} rejected (resumed at row {stats['resumed_at']})")
+    
+    if not skip_repair:
+        repair_counters()
+        search_backend().rebuild(db.session)
+        db.session.commit()
+        print('Counters and search index rebuilt')
 
 # User Authentication Routes
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.json
     
@@ -127,11 +1151,13 @@ def register():
     new_user.set_password(data.get('password'))
     
     db.session.add(new_user)
+    index_user(new_user)
     db.session.commit()
+    refresh_typeahead(new_user)
     
-    return jsonify({'message': 'User registered successfully', 'user': new_user.to_dict()}), 201
+    return jsonify({'message': 'User registered successfully', **auth_payload(new_user)}), 201
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.json
     
@@ -142,37 +1168,89 @@ def login():
     if not user or not user.check_password(data.get('password')):
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    # Return user data (in a real app, you'd return a JWT token)
-    return jsonify({'message': 'Login successful', 'user': user.to_dict()}), 200
+    return jsonify({'message': 'Login successful', **auth_payload(user)}), 200
+
+@api.route('/api/auth/logout', methods=['POST'])
+def logout():
+    # Revoke the presented token; it is rejected from now until it expires
+    token = bearer_token()
+    if token is None:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        token_signer.revoke(token)
+    except InvalidToken as e:
+        return jsonify({'error': str(e)}), 401
+    
+    return jsonify({'message': 'Logged out successfully'}), 200
 
 # Murmur Routes
-@app.route('/api/murmurs', methods=['GET'])
+def is_cached_feed_page():
+    # Only the first few pages of the global feed are hot enough to cache
+    return (request.args.get('cursor') is None
+            and request.args.get('page', 1, type=int) <= current_app.config['RESPONSE_CACHE_FEED_PAGES'])
+
+@api.route('/api/murmurs', methods=['GET'])
+@read_replica
+@cached_route(when=is_cached_feed_page)
 def get_murmurs():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
+    cursor = request.args.get('cursor')
+    
+    # Opt-in cursor mode: no total/pages, constant cost at any depth
+    if cursor is not None:
+        if per_page < 1:
+            abort(404)
+        try:
+            items, next_cursor = keyset_paginate(Murmur.query, Murmur.created_at, Murmur.id, cursor, per_page)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        return jsonify({**murmur_list_payload(items), 'next_cursor': next_cursor}), 200
+    
+    cache_tags('feed')
     
     # Get murmurs with pagination
     murmurs = Murmur.query.order_by(Murmur.created_at.desc()).paginate(page=page, per_page=per_page)
     
     return jsonify({
-        'murmurs': [murmur.to_dict() for murmur in murmurs.items],
+        **murmur_list_payload(murmurs.items),
         'total': murmurs.total,
         'pages': murmurs.pages,
         'current_page': page
     }), 200
 
-@app.route('/api/me/murmurs', methods=['POST'])
-def create_murmur():
+@api.route('/api/murmurs/trending', methods=['GET'])
+@read_replica
+def get_trending_murmurs():
+    per_page = min(request.args.get('per_page', 20, type=int), MAX_BATCH_IDS)
+    if per_page < 1:
+        abort(404)
+    try:
+        after = decode_trending_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # Never rebuilds here: until the first background rebuild finishes on a
+    # cold start (no snapshot yet) the ranking is empty
+    trending_refresher.ensure_loaded()
+    
+    # The ranking only holds ids; murmurs deleted meanwhile are skipped
+    murmur_ids, next_cursor = trending_index.page(after, per_page)
+    return jsonify({
+        **murmur_list_payload(load_murmurs(murmur_ids)),
+        'next_cursor': next_cursor and encode_trending_cursor(*next_cursor)
+    }), 200
+
+@api.route('/api/me/murmurs', methods=['POST'])
+@auth_required('user_id')
+def create_murmur(current_user_id):
     data = request.json
+    user_id = current_user_id
     
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = data.get('user_id')  # In a real app, get this from the auth token
-    
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    # Check if user exists
-    user = User.query.get(user_id)
+    # The author is embedded in the response and needed for fan-out
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -184,26 +1262,36 @@ def create_murmur():
     if len(content) > 280:
         return jsonify({'error': 'Content exceeds maximum length of 280 characters'}), 400
     
+    # Inline base64 media is stored as a blob, the murmur only keeps its URL
+    try:
+        media_url = store_data_url(data.get('media_url'))
+    except ValueError:
+        return jsonify({'error': 'Invalid media data'}), 400
+    
     # Create murmur
     new_murmur = Murmur(
         content=content,
         user_id=user_id,
         media_type=data.get('media_type'),
-        media_url=data.get('media_url')
+        media_url=media_url
     )
     
     db.session.add(new_murmur)
+    increment_counter(User, user_id, User.murmurs_count)
     db.session.commit()
     
-    return jsonify({'message': 'Murmur created successfully', 'murmur': new_murmur.to_dict()}), 201
-
-@app.route('/api/me/murmurs/<int:murmur_id>', methods=['DELETE'])
-def delete_murmur(murmur_id):
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = request.args.get('user_id')  # In a real app, get this from the auth token
+    fan_out_murmur(new_murmur, user)
+    invalidate_cache('feed', f'user_murmurs:{user_id}', f'profile:{user_id}')
     
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
+    murmur_data = new_murmur.to_dict(author=user)
+    event_broker.publish(f'user:{user_id}', 'murmur', murmur_data)
+    
+    return jsonify({'message': 'Murmur created successfully', 'murmur': murmur_data}), 201
+
+@api.route('/api/me/murmurs/<int:murmur_id>', methods=['DELETE'])
+@auth_required('user_id', 'args')
+def delete_murmur(murmur_id, current_user_id):
+    user_id = current_user_id
     
     # Find the murmur
     murmur = Murmur.query.get(murmur_id)
@@ -213,26 +1301,61 @@ def delete_murmur(murmur_id):
         return jsonify({'error': 'Murmur not found'}), 404
     
     # Check if the user is the author
-    if murmur.user_id != int(user_id):
+    if murmur.user_id != user_id:
         return jsonify({'error': 'Unauthorized to delete this murmur'}), 403
     
     # Delete the murmur
     db.session.delete(murmur)
+    increment_counter(User, murmur.user_id, User.murmurs_count, -1)
     db.session.commit()
     
+    retract_murmur(murmur_id, user_id)
+    trending_index.remove(murmur_id)
+    invalidate_cache('feed', f'murmur:{murmur_id}', f'user_murmurs:{user_id}', f'profile:{user_id}')
+    
     return jsonify({'message': 'Murmur deleted successfully'}), 200
 
 # Additional Murmur Routes
-@app.route('/api/murmurs/<int:murmur_id>', methods=['GET'])
+@api.route('/api/murmurs/<int:murmur_id>', methods=['GET'])
+@read_replica
+@cached_route()
 def get_murmur(murmur_id):
     murmur = Murmur.query.get(murmur_id)
     
     if not murmur:
         return jsonify({'error': 'Murmur not found'}), 404
     
-    return jsonify({'murmur': murmur.to_dict()}), 200
+    cache_tags(f'murmur:{murmur.id}', f'user:{murmur.user_id}')
+    murmur_data = murmur.to_dict()
+    
+    viewer_id = request.args.get('viewer_id', type=int)
+    if viewer_id:
+        annotate_liked_by_viewer([murmur_data], viewer_id)
+    
+    return jsonify({'murmur': murmur_data}), 200
+
+@api.route('/api/murmurs/batch', methods=['GET'])
+@read_replica
+def get_murmurs_batch():
+    # Hydrate many murmurs by id in one call, in the order requested. Accepts the
+    # same fields/format/viewer_id options as the list routes.
+    try:
+        murmur_ids = [int(murmur_id) for murmur_id in request.args.get('ids', '').split(',') if murmur_id.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    
+    if not murmur_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    
+    if len(murmur_ids) > MAX_BATCH_IDS:
+        return jsonify({'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+    
+    murmurs = load_murmurs(list(dict.fromkeys(murmur_ids)))
+    return jsonify(murmur_list_payload(murmurs)), 200
 
-@app.route('/api/users/<int:user_id>/murmurs', methods=['GET'])
+@api.route('/api/users/<int:user_id>/murmurs', methods=['GET'])
+@read_replica
+@cached_route()
 def get_user_murmurs(user_id):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -242,11 +1365,30 @@ def get_user_murmurs(user_id):
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
+    cache_tags(f'user:{user_id}', f'user_murmurs:{user_id}')
+    
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if per_page < 1:
+            abort(404)
+        try:
+            items, next_cursor = keyset_paginate(
+                Murmur.query.filter_by(user_id=user_id), Murmur.created_at, Murmur.id, cursor, per_page
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        return jsonify({
+            **murmur_list_payload(items),
+            'next_cursor': next_cursor,
+            'user': user.to_dict()
+        }), 200
+    
     # Get user's murmurs with pagination
     murmurs = Murmur.query.filter_by(user_id=user_id).order_by(Murmur.created_at.desc()).paginate(page=page, per_page=per_page)
     
     return jsonify({
-        'murmurs': [murmur.to_dict() for murmur in murmurs.items],
+        **murmur_list_payload(murmurs.items),
         'total': murmurs.total,
         'pages': murmurs.pages,
         'current_page': page,
@@ -254,57 +1396,115 @@ def get_user_murmurs(user_id):
     }), 200
 
 # Like/Unlike Routes
-@app.route('/api/murmurs/<int:murmur_id>/like', methods=['POST'])
-def like_murmur(murmur_id):
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = request.json.get('user_id')  # In a real app, get this from the auth token
-    
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    # Check if murmur exists
-    murmur = Murmur.query.get(murmur_id)
-    if not murmur:
+@api.route('/api/murmurs/<int:murmur_id>/like', methods=['POST'])
+@auth_required('user_id')
+def like_murmur(murmur_id, current_user_id):
+    user_id = current_user_id
+    
+    # Idempotent: liking twice leaves one like and answers 200 with the count
+    inserted = insert_like(user_id, murmur_id)
+    likes_count = add_to_likes_count(murmur_id, 1 if inserted else 0)
+    if likes_count is None:
+        db.session.rollback()
         return jsonify({'error': 'Murmur not found'}), 404
     
-    # Check if like already exists
-    existing_like = Like.query.filter_by(user_id=user_id, murmur_id=murmur_id).first()
-    if existing_like:
-        return jsonify({'error': 'Already liked this murmur'}), 400
-    
-    # Create like
-    new_like = Like(user_id=user_id, murmur_id=murmur_id)
-    db.session.add(new_like)
     db.session.commit()
+    if inserted:
+        publish_likes_count(murmur_id, 1, likes_count)
+        record_trending(murmur_id, 1)
     
-    return jsonify({'message': 'Murmur liked successfully', 'likes_count': len(murmur.likes)}), 201
+    return jsonify({'message': 'Murmur liked successfully', 'likes_count': likes_count}), 201 if inserted else 200
 
-@app.route('/api/murmurs/<int:murmur_id>/unlike', methods=['DELETE'])
-def unlike_murmur(murmur_id):
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = request.json.get('user_id')  # In a real app, get this from the auth token
-    
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    # Check if murmur exists
-    murmur = Murmur.query.get(murmur_id)
-    if not murmur:
+@api.route('/api/murmurs/<int:murmur_id>/unlike', methods=['DELETE'])
+@auth_required('user_id')
+def unlike_murmur(murmur_id, current_user_id):
+    user_id = current_user_id
+    
+    # Idempotent: unliking a murmur that isn't liked is a no-op
+    deleted = db.session.execute(
+        db.delete(Like).where(Like.user_id == user_id, Like.murmur_id == murmur_id)
+    ).rowcount == 1
+    likes_count = add_to_likes_count(murmur_id, -1 if deleted else 0)
+    if likes_count is None:
+        db.session.rollback()
         return jsonify({'error': 'Murmur not found'}), 404
     
-    # Find the like
-    like = Like.query.filter_by(user_id=user_id, murmur_id=murmur_id).first()
-    if not like:
-        return jsonify({'error': 'Not liked this murmur yet'}), 400
-    
-    # Remove like
-    db.session.delete(like)
     db.session.commit()
+    if deleted:
+        publish_likes_count(murmur_id, -1, likes_count)
+        record_trending(murmur_id, -1)
+    
+    return jsonify({'message': 'Murmur unliked successfully', 'likes_count': likes_count}), 200
+
+# Live updates
+def event_stream(broker, subscription, heartbeat):
+    # Runs after the request has ended, without an app context, so the broker is
+    # passed in rather than looked up through the event_broker proxy
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            message = subscription.get(timeout=heartbeat)
+            if message is OVERFLOWED:
+                # Too far behind: the client should reload and reconnect
+                yield format_event('reset', {})
+                return
+            yield message if message is not None else ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+@api.route('/api/stream', methods=['GET'])
+@auth_required('user_id', 'args', token_param='access_token')
+def stream_events(current_user_id):
+    # Server-Sent Events: 'murmur' events for new murmurs by the user and the
+    # accounts they follow, 'likes' events for the murmurs listed in ?murmurs=
+    # (the ones on screen; reconnect with a new list as it changes)
+    try:
+        murmur_ids = [int(murmur_id) for murmur_id in request.args.get('murmurs', '').split(',') if murmur_id.strip()]
+    except ValueError:
+        return jsonify({'error': 'murmurs must be a comma-separated list of integers'}), 400
+    
+    if len(murmur_ids) > MAX_BATCH_IDS:
+        return jsonify({'error': f'At most {MAX_BATCH_IDS} murmurs per stream'}), 400
+    
+    followed_ids = [followed_id for (followed_id,) in db.session.query(Follow.followed_id).filter_by(follower_id=current_user_id)]
+    topics = [f'user:{user_id}' for user_id in [current_user_id] + followed_ids]
+    topics += [f'murmur:{murmur_id}' for murmur_id in murmur_ids]
+    
+    broker = event_broker._get_current_object()
+    subscription = broker.subscribe(topics)
+    return Response(event_stream(broker, subscription, current_app.config['SSE_HEARTBEAT']), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Export
+# Token only: the unverified user_id parameter would hand anyone the full
+# like history and follow graph of any user
+@api.route('/api/me/export', methods=['GET'])
+@auth_required(legacy_field=None)
+@read_replica
+def export_user_data(current_user_id):
+    # Streams the caller's data as NDJSON (see export_user_chunks), gzipped on
+    # the fly when the client accepts it
+    user = db.session.get(User, current_user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     
-    return jsonify({'message': 'Murmur unliked successfully', 'likes_count': len(murmur.likes)}), 200
+    chunks = export_user_chunks(user, current_app.config['EXPORT_BATCH_SIZE'])
+    headers = {
+        'Content-Disposition': f'attachment; filename=murmur-export-{user.id}.ndjson',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding'
+    }
+    if request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream_with_context(chunks), mimetype='application/x-ndjson', headers=headers)
 
 # Search Users
-@app.route('/api/users/search', methods=['GET'])
+@api.route('/api/users/search', methods=['GET'])
+@read_replica
 def search_users():
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
@@ -313,63 +1513,56 @@ def search_users():
     if not query:
         return jsonify({'error': 'Search query is required'}), 400
     
-    # Search for users with LIKE pattern matching on name, username, and bio
-    search_pattern = f"%{query}%"
-    users = User.query.filter(
-        db.or_(
-            User.name.ilike(search_pattern),
-            User.username.ilike(search_pattern),
-            User.bio.ilike(search_pattern)
-        )
-    ).paginate(page=page, per_page=per_page)
+    if page < 1 or per_page < 1:
+        abort(404)
     
-    user_list = []
-    for user in users.items:
-        user_data = user.to_dict()
-        # Add follower and following counts
-        user_data['followers_count'] = Follow.query.filter_by(followed_id=user.id).count()
-        user_data['following_count'] = Follow.query.filter_by(follower_id=user.id).count()
-        user_data['murmurs_count'] = Murmur.query.filter_by(user_id=user.id).count()
-        user_list.append(user_data)
+    # Ranked, indexed search on name, username and bio
+    user_ids, total = search_backend().search(db.session, query, page, per_page)
+    if page > 1 and not user_ids:
+        abort(404)
+    
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+    
+    user_list = [users[user_id].to_dict(include_counts=True) for user_id in user_ids if user_id in users]
     
     return jsonify({
         'users': user_list,
-        'total': users.total,
-        'pages': users.pages,
+        'total': total,
+        'pages': math.ceil(total / per_page),
         'current_page': page,
         'query': query
     }), 200
 
+@api.route('/api/users/typeahead', methods=['GET'])
+def typeahead_users():
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    
+    # Served from memory only; the index is (re)loaded from the users table in
+    # the background, starting with the first request
+    typeahead_refresher.ensure_started()
+    
+    return jsonify({'users': typeahead_index.search(query, limit), 'query': query}), 200
+
 # User Profile Routes
-@app.route('/api/users/<int:user_id>', methods=['GET'])
+@api.route('/api/users/<int:user_id>', methods=['GET'])
+@read_replica
+@cached_route()
 def get_user(user_id):
     user = User.query.get(user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    # Get followers and following counts
-    followers_count = Follow.query.filter_by(followed_id=user_id).count()
-    following_count = Follow.query.filter_by(follower_id=user_id).count()
-    murmurs_count = Murmur.query.filter_by(user_id=user_id).count()
-    
-    user_data = user.to_dict()
-    user_data['followers_count'] = followers_count
-    user_data['following_count'] = following_count
-    user_data['murmurs_count'] = murmurs_count
+    # profile:<id> covers the counters, which change without the user being edited
+    cache_tags(f'user:{user_id}', f'profile:{user_id}')
     
-    return jsonify({'user': user_data}), 200
+    return jsonify({'user': user.to_dict(include_counts=True)}), 200
 
-@app.route('/api/me/profile', methods=['PUT'])
-def update_profile():
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = request.json.get('user_id')  # In a real app, get this from the auth token
-    
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    # Find the user
-    user = User.query.get(user_id)
+@api.route('/api/me/profile', methods=['PUT'])
+@auth_required('user_id')
+def update_profile(current_user_id):
+    user = db.session.get(User, current_user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -388,22 +1581,22 @@ def update_profile():
     if 'bio' in data:
         user.bio = data['bio']
     if 'profile_image' in data:
-        user.profile_image = data['profile_image']
+        try:
+            user.profile_image = store_data_url(data['profile_image'], kinds=('image/',))
+        except ValueError:
+            return jsonify({'error': 'Invalid image data'}), 400
     
+    index_user(user)
     db.session.commit()
+    invalidate_cache(f'user:{user.id}')
+    refresh_typeahead(user)
     
     return jsonify({'message': 'Profile updated successfully', 'user': user.to_dict()}), 200
 
-@app.route('/api/me/profile/upload-image', methods=['POST'])
-def upload_profile_image():
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = request.form.get('user_id')  # In a real app, get this from the auth token
-    
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    # Find the user
-    user = User.query.get(user_id)
+@api.route('/api/me/profile/upload-image', methods=['POST'])
+@auth_required('user_id', 'form')
+def upload_profile_image(current_user_id):
+    user = db.session.get(User, current_user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
@@ -422,13 +1615,14 @@ def upload_profile_image():
     if not '.' in file.filename or file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
         return jsonify({'error': 'Invalid file type. Only images are allowed (PNG, JPG, JPEG, GIF)'}), 400
     
-    # In a real application, you'd save the file to a storage service (S3, etc.)
-    # For this demo, we'll encode the image as base64 and save it in the database
-    import base64
-    encoded_image = base64.b64encode(file.read()).decode('utf-8')
-    user.profile_image = f"data:image/{file.filename.rsplit('.', 1)[1].lower()};base64,{encoded_image}"
+    # Stream the upload into the blob store in chunks and keep only its URL
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    digest = blob_store.save_stream(file.stream)
+    user.profile_image = blob_url(digest, mimetypes.types_map.get(f'.{extension}', 'image/jpeg'))
     
     db.session.commit()
+    invalidate_cache(f'user:{user.id}')
+    refresh_typeahead(user)
     
     return jsonify({
         'message': 'Profile image uploaded successfully',
@@ -436,20 +1630,41 @@ def upload_profile_image():
         'user': user.to_dict()
     }), 200
 
+@api.route('/api/blobs/<name>', methods=['GET'])
+def get_blob(name):
+    # Only the canonical extension of an accepted media type is served, and
+    # it decides the Content-Type: nothing here is ever served as HTML or SVG
+    try:
+        digest, mimetype = parse_blob_name(name)
+        path = blob_store.path(digest)
+    except ValueError:
+        return jsonify({'error': 'Blob not found'}), 404
+    
+    if not os.path.exists(path):
+        return jsonify({'error': 'Blob not found'}), 404
+    
+    # Blobs are immutable, so the digest is a strong ETag; conditional=True
+    # answers If-None-Match with 304 and Range requests with 206
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=digest,
+        max_age=31536000
+    )
+    # Uploaded bytes are untrusted: no sniffing, and no scripts if opened directly
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = 'sandbox'
+    return response
+
 # Follow/Unfollow Routes
-@app.route('/api/users/<int:user_id>/follow', methods=['POST'])
-def follow_user(user_id):
-    # Get follower ID from auth token (for now, we'll use a placeholder)
-    follower_id = request.json.get('follower_id')  # In a real app, get this from the auth token
+@api.route('/api/users/<int:user_id>/follow', methods=['POST'])
+@auth_required('follower_id')
+def follow_user(user_id, current_user_id):
+    follower_id = current_user_id
     
-    if not follower_id:
-        return jsonify({'error': 'Authentication required'}), 401
-    
-    # Check if users exist
-    followed_user = User.query.get(user_id)
-    follower_user = User.query.get(follower_id)
-    
-    if not followed_user or not follower_user:
+    # Check if the followed user exists (the follower was authenticated)
+    if db.session.get(User, user_id) is None:
         return jsonify({'error': 'User not found'}), 404
     
     # Check if already following
@@ -460,17 +1675,20 @@ def follow_user(user_id):
     # Create follow relationship
     new_follow = Follow(follower_id=follower_id, followed_id=user_id)
     db.session.add(new_follow)
+    increment_counter(User, user_id, User.followers_count)
+    increment_counter(User, follower_id, User.following_count)
     db.session.commit()
     
+    # The follower's timeline now includes a new account; rebuild it on next read
+    timeline_store.invalidate(follower_id)
+    invalidate_cache(f'profile:{user_id}', f'profile:{follower_id}')
+    
     return jsonify({'message': 'User followed successfully'}), 201
 
-@app.route('/api/users/<int:user_id>/unfollow', methods=['DELETE'])
-def unfollow_user(user_id):
-    # Get follower ID from auth token (for now, we'll use a placeholder)
-    follower_id = request.json.get('follower_id')  # In a real app, get this from the auth token
-    
-    if not follower_id:
-        return jsonify({'error': 'Authentication required'}), 401
+@api.route('/api/users/<int:user_id>/unfollow', methods=['DELETE'])
+@auth_required('follower_id')
+def unfollow_user(user_id, current_user_id):
+    follower_id = current_user_id
     
     # Find the follow relationship
     follow = Follow.query.filter_by(follower_id=follower_id, followed_id=user_id).first()
@@ -480,77 +1698,85 @@ def unfollow_user(user_id):
     
     # Remove follow relationship
     db.session.delete(follow)
+    increment_counter(User, user_id, User.followers_count, -1)
+    increment_counter(User, follower_id, User.following_count, -1)
     db.session.commit()
     
+    timeline_store.invalidate(follower_id)
+    invalidate_cache(f'profile:{user_id}', f'profile:{follower_id}')
+    
     return jsonify({'message': 'User unfollowed successfully'}), 200
 
-@app.route('/api/users/<int:user_id>/followers', methods=['GET'])
+@api.route('/api/users/<int:user_id>/followers', methods=['GET'])
+@read_replica
 def get_followers(user_id):
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    # Check if user exists
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    
-    # Get user's followers
-    follows = Follow.query.filter_by(followed_id=user_id).paginate(page=page, per_page=per_page)
-    followers = [User.query.get(follow.follower_id).to_dict() for follow in follows.items]
-    
-    return jsonify({
-        'followers': followers,
-        'total': follows.total,
-        'pages': follows.pages,
-        'current_page': page
-    }), 200
+    return list_follow_users(user_id, 'followers')
 
-@app.route('/api/users/<int:user_id>/following', methods=['GET'])
+@api.route('/api/users/<int:user_id>/following', methods=['GET'])
+@read_replica
 def get_following(user_id):
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
-    # Check if user exists
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    
-    # Get users that this user is following
-    follows = Follow.query.filter_by(follower_id=user_id).paginate(page=page, per_page=per_page)
-    following = [User.query.get(follow.followed_id).to_dict() for follow in follows.items]
-    
-    return jsonify({
-        'following': following,
-        'total': follows.total,
-        'pages': follows.pages,
-        'current_page': page
-    }), 200
+    return list_follow_users(user_id, 'following')
 
-@app.route('/api/timeline', methods=['GET'])
-def get_timeline():
-    # Get user ID from auth token (for now, we'll use a placeholder)
-    user_id = request.args.get('user_id')  # In a real app, get this from the auth token
-    
-    if not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
+@api.route('/api/timeline', methods=['GET'])
+@auth_required('user_id', 'args')
+@read_replica
+def get_timeline(current_user_id):
+    user_id = current_user_id
     
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    # Get IDs of users that the current user is following
-    following_ids = [f.followed_id for f in Follow.query.filter_by(follower_id=user_id).all()]
-    # Include the user's own murmurs
-    following_ids.append(int(user_id))
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if per_page < 1:
+            abort(404)
+        try:
+            before = decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        
+        # Serve from the precomputed timeline when the page is inside its window
+        entries = timeline_entries(user_id, per_page + 1, before)
+        if entries is not None:
+            items = load_murmurs([murmur_id for _, murmur_id in entries[:per_page]])
+            next_cursor = encode_cursor(*entries[per_page - 1]) if len(entries) > per_page else None
+        else:
+            items, next_cursor = keyset_paginate(
+                Murmur.query.filter(timeline_filter(user_id)), Murmur.created_at, Murmur.id, cursor, per_page
+            )
+        
+        return jsonify({**murmur_list_payload(items), 'next_cursor': next_cursor}), 200
+    
+    entries = timeline_entries(user_id, page * per_page) if page > 0 and per_page > 0 else None
+    # Pages past the end fall through to .paginate(), which answers them with a 404
+    if entries is not None and (page == 1 or len(entries) > (page - 1) * per_page):
+        items = load_murmurs([murmur_id for _, murmur_id in entries[(page - 1) * per_page:]])
+        
+        # The total comes from the authors' murmur counters instead of a COUNT(*)
+        followed_ids = db.select(Follow.followed_id).where(Follow.follower_id == user_id)
+        total = db.session.query(db.func.coalesce(db.func.sum(User.murmurs_count), 0)).filter(
+            db.or_(User.id == user_id, User.id.in_(followed_ids))
+        ).scalar()
+        
+        return jsonify({
+            **murmur_list_payload(items),
+            'total': total,
+            'pages': math.ceil(total / per_page),
+            'current_page': page
+        }), 200
     
     # Get murmurs from followed users and the user themselves
-    timeline = Murmur.query.filter(Murmur.user_id.in_(following_ids)).order_by(Murmur.created_at.desc()).paginate(page=page, per_page=per_page)
+    timeline = Murmur.query.filter(timeline_filter(user_id)).order_by(Murmur.created_at.desc()).paginate(page=page, per_page=per_page)
     
     return jsonify({
-        'murmurs': [murmur.to_dict() for murmur in timeline.items],
+        **murmur_list_payload(timeline.items),
         'total': timeline.total,
         'pages': timeline.pages,
         'current_page': page
     }), 200
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -53,6 +53,9 @@ function setupNavigation() {
 function handleRouteChange() {
     const hash = window.location.hash;
     
+    // Feeds open their own live stream once rendered
+    closeLiveUpdates();
+    
     if (hash.startsWith('#/users/')) {
         const userId = hash.replace('#/users/', '');
         loadUserProfile(userId);
@@ -262,6 +265,14 @@ async function loadTimeline() {
             }
             
             mainContent.appendChild(murmursContainer);
+            
+            // Live like counts for this page; new murmurs from followed accounts
+            // are added on top of the first page
+            subscribeToLiveUpdates(result.murmurs.map(murmur => murmur.id), (murmur) => {
+                if (currentPage === 1) {
+                    murmursContainer.insertBefore(createMurmurCard(murmur), murmursContainer.firstChild);
+                }
+            }, loadTimeline);
         }
     } catch (error) {
         console.error('Error loading timeline:', error);
@@ -343,6 +354,9 @@ async function loadAllMurmurs() {
             }
             
             mainContent.appendChild(murmursContainer);
+            
+            // Live like counts for this page
+            subscribeToLiveUpdates(result.murmurs.map(murmur => murmur.id), null, loadAllMurmurs);
         }
     } catch (error) {
         console.error('Error loading murmurs:', error);
@@ -163,8 +163,9 @@ function setupLoginLogout() {
                 const data = await result.json();
                 
                 if (result.ok) {
-                    // Store user data in localStorage
+                    // Store user data and access token in localStorage
                     localStorage.setItem('currentUser', JSON.stringify(data.user));
+                    localStorage.setItem('authToken', data.token);
                     
                     // Close modal
                     document.getElementById('login-modal').classList.add('hidden');
@@ -217,8 +218,9 @@ function setupLoginLogout() {
                 const data = await result.json();
                 
                 if (result.ok) {
-                    // Store user data in localStorage
+                    // Store user data and access token in localStorage
                     localStorage.setItem('currentUser', JSON.stringify(data.user));
+                    localStorage.setItem('authToken', data.token);
                     
                     // Close modal
                     document.getElementById('register-modal').classList.add('hidden');
@@ -247,8 +249,14 @@ function setupLoginLogout() {
         logoutBtn.addEventListener('click', (e) => {
             e.preventDefault();
             
+            // Revoke the access token server-side (best effort)
+            if (localStorage.getItem('authToken')) {
+                fetch('/api/auth/logout', { method: 'POST', headers: authHeaders() }).catch(() => {});
+            }
+            
             // Clear user data from localStorage
             localStorage.removeItem('currentUser');
+            localStorage.removeItem('authToken');
             
             // Update UI
             updateAuthUI();
@@ -282,9 +290,9 @@ async function postNewMurmur(content, mediaType, mediaData) {
     try {
         const response = await fetch('/api/me/murmurs', {
             method: 'POST',
-            headers: {
+            headers: authHeaders({
                 'Content-Type': 'application/json'
-            },
+            }),
             body: JSON.stringify({
                 user_id: currentUser.id,
                 content,
@@ -318,7 +326,8 @@ async function deleteMurmur(murmurId) {
     
     try {
         const response = await fetch(`/api/me/murmurs/${murmurId}?user_id=${currentUser.id}`, {
-            method: 'DELETE'
+            method: 'DELETE',
+            headers: authHeaders()
         });
         
         const data = await response.json();
@@ -351,9 +360,9 @@ async function toggleLike(murmurId, isLiked) {
             // Unlike
             response = await fetch(`/api/murmurs/${murmurId}/unlike`, {
                 method: 'DELETE',
-                headers: {
+                headers: authHeaders({
                     'Content-Type': 'application/json'
-                },
+                }),
                 body: JSON.stringify({
                     user_id: currentUser.id
                 })
@@ -362,9 +371,9 @@ async function toggleLike(murmurId, isLiked) {
             // Like
             response = await fetch(`/api/murmurs/${murmurId}/like`, {
                 method: 'POST',
-                headers: {
+                headers: authHeaders({
                     'Content-Type': 'application/json'
-                },
+                }),
                 body: JSON.stringify({
                     user_id: currentUser.id
                 })
@@ -401,9 +410,9 @@ async function toggleFollow(userId, isFollowing) {
             // Unfollow
             response = await fetch(`/api/users/${userId}/unfollow`, {
                 method: 'DELETE',
-                headers: {
+                headers: authHeaders({
                     'Content-Type': 'application/json'
-                },
+                }),
                 body: JSON.stringify({
                     follower_id: currentUser.id
                 })
@@ -412,9 +421,9 @@ async function toggleFollow(userId, isFollowing) {
             // Follow
             response = await fetch(`/api/users/${userId}/follow`, {
                 method: 'POST',
-                headers: {
+                headers: authHeaders({
                     'Content-Type': 'application/json'
-                },
+                }),
                 body: JSON.stringify({
                     follower_id: currentUser.id
                 })
@@ -475,10 +484,68 @@ async function getUserProfile(userId) {
     }
 }
 
+// Request headers with the stored access token, if any
+function authHeaders(headers = {}) {
+    const token = localStorage.getItem('authToken');
+    return token ? { ...headers, 'Authorization': `Bearer ${token}` } : headers;
+}
+
+// Query string parameter that asks the API to flag murmurs the current user liked
+function viewerParam() {
+    const currentUser = localStorage.getItem('currentUser') ? JSON.parse(localStorage.getItem('currentUser')) : null;
+    return currentUser ? `&viewer_id=${currentUser.id}` : '';
+}
+
+// Live updates: new murmurs from followed accounts and like counts of the
+// murmurs on screen. Call again with the new ids whenever the list changes;
+// onReset reloads the list when the server dropped events for this stream.
+let liveStream = null;
+function closeLiveUpdates() {
+    if (liveStream) {
+        liveStream.close();
+        liveStream = null;
+    }
+}
+
+function subscribeToLiveUpdates(murmurIds, onNewMurmur, onReset) {
+    const currentUser = localStorage.getItem('currentUser') ? JSON.parse(localStorage.getItem('currentUser')) : null;
+    const token = localStorage.getItem('authToken');
+
+    closeLiveUpdates();
+    if (!currentUser || !token || !window.EventSource) {
+        return null;
+    }
+
+    liveStream = new EventSource(`/api/stream?access_token=${encodeURIComponent(token)}&murmurs=${murmurIds.join(',')}`);
+
+    liveStream.addEventListener('likes', (e) => {
+        const data = JSON.parse(e.data);
+        document.querySelectorAll(`.like-button[data-murmur-id="${data.murmur_id}"] .like-count`).forEach(el => {
+            el.textContent = data.likes_count;
+        });
+    });
+
+    liveStream.addEventListener('murmur', (e) => {
+        if (onNewMurmur) {
+            onNewMurmur(JSON.parse(e.data));
+        }
+    });
+
+    // The server dropped events for this stream; reload to catch up
+    liveStream.addEventListener('reset', () => {
+        closeLiveUpdates();
+        if (onReset) {
+            onReset();
+        }
+    });
+
+    return liveStream;
+}
+
 // Get user murmurs
 async function getUserMurmurs(userId, page = 1) {
     try {
-        const response = await fetch(`/api/users/${userId}/murmurs?page=${page}&per_page=10`);
+        const response = await fetch(`/api/users/${userId}/murmurs?page=${page}&per_page=10${viewerParam()}`);
         const data = await response.json();
         
         if (response.ok) {
@@ -504,7 +571,7 @@ async function getUserMurmurs(userId, page = 1) {
 // Get all murmurs (explore)
 async function getAllMurmurs(page = 1) {
     try {
-        const response = await fetch(`/api/murmurs?page=${page}&per_page=10`);
+        const response = await fetch(`/api/murmurs?page=${page}&per_page=10${viewerParam()}`);
         const data = await response.json();
         
         if (response.ok) {
@@ -530,7 +597,9 @@ async function getAllMurmurs(page = 1) {
 // Get user timeline
 async function getUserTimeline(userId, page = 1) {
     try {
-        const response = await fetch(`/api/timeline?user_id=${userId}&page=${page}&per_page=10`);
+        const response = await fetch(`/api/timeline?user_id=${userId}&page=${page}&per_page=10${viewerParam()}`, {
+            headers: authHeaders()
+        });
         const data = await response.json();
         
         if (response.ok) {
@@ -842,8 +911,10 @@ function createMurmurCard(murmur) {
     // Check if current user has liked this murmur
     const currentUser = localStorage.getItem('currentUser') ? JSON.parse(localStorage.getItem('currentUser')) : null;
     let isLiked = false;
-    // For now, we'll determine this on the client side
-    if (currentUser) {
+    // The API flags liked murmurs when asked with viewer_id; fall back to the local record
+    if (typeof murmur.liked_by_viewer === 'boolean') {
+        isLiked = murmur.liked_by_viewer;
+    } else if (currentUser) {
         const likedMurmurs = JSON.parse(localStorage.getItem(`user_${currentUser.id}_likes`) || '[]');
         isLiked = likedMurmurs.includes(murmur.id);
     }
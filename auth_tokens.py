@@ -0,0 +1,77 @@
+"""Signed, expiring access tokens (JWT) for the API.
+
+A token carries the user id in ``sub``, a random ``jti`` and an ``exp``.
+Verifying one is a signature and expiry check in memory, so authenticated
+routes know who the caller is without loading the user row. Logging out puts
+the token's ``jti`` in a revocation list until the token would have expired
+anyway; the list is per process, so with several workers a revoked token
+stays usable on the others until it expires (keep ``ttl`` short).
+"""
+import secrets
+import threading
+import time
+
+import jwt
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}  # jti -> exp
+
+    def revoke(self, jti, expires_at):
+        now = time.time()
+        with self._lock:
+            # Entries only matter until the token expires on its own
+            for stale in [key for key, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[stale]
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        with self._lock:
+            return jti in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+class TokenSigner:
+    def __init__(self, secret, ttl=3600, algorithm='HS256', revocations=None):
+        self.secret = secret
+        self.ttl = ttl
+        self.algorithm = algorithm
+        self.revocations = revocations if revocations is not None else RevocationList()
+
+    def issue(self, user_id):
+        """Return ``(token, expires_at)`` for ``user_id``."""
+        now = int(time.time())
+        expires_at = now + self.ttl
+        claims = {'sub': str(user_id), 'iat': now, 'exp': expires_at, 'jti': secrets.token_urlsafe(12)}
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm), expires_at
+
+    def verify(self, token):
+        """Return the token's claims or raise InvalidToken."""
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[self.algorithm],
+                                options={'require': ['sub', 'exp', 'jti']})
+        except jwt.ExpiredSignatureError:
+            raise InvalidToken('Token expired')
+        except jwt.InvalidTokenError:
+            raise InvalidToken('Invalid token')
+        if self.revocations.is_revoked(claims['jti']):
+            raise InvalidToken('Token revoked')
+        return claims
+
+    def user_id(self, token):
+        try:
+            return int(self.verify(token)['sub'])
+        except ValueError:
+            raise InvalidToken('Invalid token')
+
+    def revoke(self, token):
+        claims = self.verify(token)
+        self.revocations.revoke(claims['jti'], claims['exp'])
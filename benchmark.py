@@ -0,0 +1,300 @@
+"""Load-generation and latency benchmark for the Flask API.
+
+Seeds a synthetic social graph into a fresh SQLite file (or the database
+given with --database-url), then drives the real routes in app.py through
+Flask's test client and reports, per endpoint, throughput, p50/p95/p99
+latency and SQL queries per request.
+
+    python benchmark.py --users 2000 --murmurs 50000 --output bench_baseline.json
+    python benchmark.py --users 2000 --murmurs 50000 --compare bench_baseline.json
+
+With --compare the run exits non-zero when an endpoint's p95 latency grows by
+more than --tolerance or it issues more queries per request than the baseline.
+
+--accept-encoding sends that header with every request (bytes per response
+then reflect compression), and --encoding-report measures JSON encode time per
+provider and compressed sizes for home timeline pages:
+
+    python benchmark.py --encoding-report --accept-encoding gzip
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Database to seed (default: a temporary SQLite file). It must be empty.')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--avg-follows', type=float, default=20, help='Mean follow edges per user (power-law distributed).')
+    parser.add_argument('--murmurs', type=int, default=20000)
+    parser.add_argument('--likes', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-response-cache', action='store_true', help='Disable the response cache for the run.')
+    parser.add_argument('--accept-encoding', default='identity', help='Accept-Encoding header of every request (default identity).')
+    parser.add_argument('--json-provider', help='JSON provider of the app (orjson or stdlib; default: the app default).')
+    parser.add_argument('--encoding-report', action='store_true', help='Report encode time and compressed size of timeline pages.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', help='Baseline JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative p95 growth (default 0.25).')
+    return parser.parse_args(argv)
+
+
+def power_law(rng, mean, alpha=2.0):
+    # Pareto-distributed integer with the requested mean
+    scale = mean * (alpha - 1) / alpha
+    return int(scale * rng.paretovariate(alpha))
+
+
+def seed_database(app_module, args, rng):
+    db = app_module.db
+    User, Murmur, Follow, Like = app_module.User, app_module.Murmur, app_module.Follow, app_module.Like
+    now = datetime.utcnow()
+    password_hash = app_module.generate_password_hash('benchmark')
+
+    db.session.execute(db.insert(User), [
+        {'id': i, 'name': f'Bench User {i}', 'username': f'user{i}', 'email': f'user{i}@example.com',
+         'password_hash': password_hash, 'bio': f'Synthetic account number {i}',
+         'created_at': now, 'updated_at': now}
+        for i in range(1, args.users + 1)
+    ])
+
+    # Popularity follows a Zipf-like curve so a few accounts get most followers
+    user_ids = list(range(1, args.users + 1))
+    popularity = [1.0 / rank for rank in user_ids]
+
+    follows = set()
+    for follower_id in user_ids:
+        degree = min(power_law(rng, args.avg_follows), args.users - 1)
+        for followed_id in rng.choices(user_ids, weights=popularity, k=degree):
+            if followed_id != follower_id:
+                follows.add((follower_id, followed_id))
+    db.session.execute(db.insert(Follow), [
+        {'follower_id': follower_id, 'followed_id': followed_id, 'created_at': now}
+        for follower_id, followed_id in follows
+    ])
+
+    authors = rng.choices(user_ids, weights=popularity, k=args.murmurs)
+    db.session.execute(db.insert(Murmur), [
+        {'id': i + 1, 'content': f'Synthetic murmur {i} ' + 'lorem ipsum ' * rng.randint(1, 15),
+         'user_id': author_id, 'created_at': now - timedelta(seconds=args.murmurs - i),
+         'updated_at': now - timedelta(seconds=args.murmurs - i)}
+        for i, author_id in enumerate(authors)
+    ])
+
+    murmur_ids = list(range(1, args.murmurs + 1))
+    likes = set()
+    for _ in range(args.likes):
+        # Recent murmurs collect most of the likes
+        murmur_id = max(1, args.murmurs - int(rng.expovariate(1.0 / max(args.murmurs / 10, 1))))
+        likes.add((rng.choice(user_ids), murmur_id))
+    db.session.execute(db.insert(Like), [
+        {'user_id': user_id, 'murmur_id': murmur_id, 'created_at': now}
+        for user_id, murmur_id in likes
+    ])
+    db.session.commit()
+
+    app_module.repair_counters()
+    app_module.search_backend().rebuild(db.session)
+    db.session.commit()
+
+    return {'users': args.users, 'follows': len(follows), 'murmurs': args.murmurs, 'likes': len(likes)}, murmur_ids
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_endpoint(client, query_counter, make_request, count):
+    latencies = []
+    queries = 0
+    errors = 0
+    body_bytes = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        query_counter[0] = 0
+        request_started = time.perf_counter()
+        response = make_request(client)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        queries += query_counter[0]
+        body_bytes += len(response.data)
+        if response.status_code >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'queries_per_request': round(queries / count, 2),
+        'bytes_per_response': round(body_bytes / count),
+    }
+
+
+def scenarios(args, rng, murmur_ids):
+    user_ids = range(1, args.users + 1)
+    per_page = args.per_page
+
+    def like(client):
+        murmur_id = rng.choice(murmur_ids)
+        user_id = rng.choice(user_ids)
+        response = client.post(f'/api/murmurs/{murmur_id}/like', json={'user_id': user_id})
+        client.delete(f'/api/murmurs/{murmur_id}/unlike', json={'user_id': user_id})
+        return response
+
+    def follow(client):
+        user_id, follower_id = rng.sample(user_ids, 2)
+        response = client.post(f'/api/users/{user_id}/follow', json={'follower_id': follower_id})
+        client.delete(f'/api/users/{user_id}/unfollow', json={'follower_id': follower_id})
+        return response
+
+    return {
+        'timeline': lambda client: client.get(f'/api/timeline?user_id={rng.choice(user_ids)}&per_page={per_page}'),
+        'timeline_cursor': lambda client: client.get(f'/api/timeline?user_id={rng.choice(user_ids)}&per_page={per_page}&cursor='),
+        'murmurs': lambda client: client.get(f'/api/murmurs?page={rng.randint(1, 5)}&per_page={per_page}'),
+        'murmurs_deep': lambda client: client.get(f'/api/murmurs?page={rng.randint(50, 100)}&per_page={per_page}'),
+        'search': lambda client: client.get(f'/api/users/search?q=user{rng.randint(1, 99)}'),
+        'profile': lambda client: client.get(f'/api/users/{rng.choice(user_ids)}'),
+        'user_murmurs': lambda client: client.get(f'/api/users/{rng.choice(user_ids[:50])}/murmurs?per_page={per_page}'),
+        'like_unlike': like,
+        'follow_unfollow': follow,
+    }
+
+
+def encoding_report(app, client, args, rng):
+    # Encode time per JSON provider and mean body size per content coding, over
+    # a sample of home timeline pages
+    from compression import ENCODINGS, ResponseCompressor
+    from json_provider import PROVIDERS, provider_class
+
+    user_ids = range(1, args.users + 1)
+    pages = [
+        client.get(f'/api/timeline?user_id={rng.choice(user_ids)}&per_page={args.per_page}',
+                   headers={'Accept-Encoding': 'identity'}).get_json()
+        for _ in range(min(args.requests, 50))
+    ]
+
+    # Each measurement is repeated so timer resolution and warm-up don't dominate
+    rounds = 20
+    report = {'pages': len(pages), 'encode_us': {}, 'compress_us': {}, 'bytes': {}}
+    for name in PROVIDERS:
+        provider = provider_class(name)(app)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            bodies = [provider.response(page).get_data() for page in pages]
+        report['encode_us'][name] = round((time.perf_counter() - started) / (rounds * len(pages)) * 1e6, 1)
+
+    compressor = ResponseCompressor()
+    report['bytes']['identity'] = round(sum(map(len, bodies)) / len(bodies))
+    for encoding in ENCODINGS:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            sizes = [len(compressor.compress(body, encoding)) for body in bodies]
+        report['compress_us'][encoding] = round((time.perf_counter() - started) / (rounds * len(bodies)) * 1e6, 1)
+        report['bytes'][encoding] = round(sum(sizes) / len(sizes))
+    return report
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries_per_request'] > previous['queries_per_request']:
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='murmur-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = database_url
+    if args.no_response_cache:
+        os.environ['RESPONSE_CACHE_MAX_ENTRIES'] = '0'
+    if args.json_provider:
+        os.environ['JSON_PROVIDER'] = args.json_provider
+
+    # create_app() reads the database URL and cache settings from the environment
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+    from sqlalchemy import event
+
+    app = app_module.create_app()
+    with app.app_context():
+        app_module.init_db()
+        started = time.perf_counter()
+        scale, murmur_ids = seed_database(app_module, args, rng)
+        print(f"Seeded {scale} in {time.perf_counter() - started:.1f}s ({app_module.db.engine.dialect.name})")
+
+        query_counter = [0]
+        event.listen(app_module.db.engine, 'before_cursor_execute',
+                     lambda *_: query_counter.__setitem__(0, query_counter[0] + 1))
+
+    client = app.test_client()
+    client.environ_base['HTTP_ACCEPT_ENCODING'] = args.accept_encoding
+    results = {
+        'meta': {'dialect': database_url.split(':', 1)[0], 'scale': scale, 'requests': args.requests,
+                 'per_page': args.per_page, 'seed': args.seed, 'response_cache': not args.no_response_cache,
+                 'accept_encoding': args.accept_encoding, 'json_provider': type(app.json).__name__,
+                 'created_at': datetime.utcnow().isoformat()},
+        'endpoints': {},
+    }
+
+    print(f"{'endpoint':<18}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'bytes':>9}{'errors':>8}")
+    for name, make_request in scenarios(args, rng, murmur_ids).items():
+        stats = run_endpoint(client, query_counter, make_request, args.requests)
+        results['endpoints'][name] = stats
+        print(f"{name:<18}{stats['throughput_rps']:>9}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['queries_per_request']:>9}{stats['bytes_per_response']:>9}{stats['errors']:>8}")
+
+    if args.encoding_report:
+        report = results['encoding'] = encoding_report(app, client, args, rng)
+        print(f"Timeline pages ({report['pages']} sampled, per_page={args.per_page}):")
+        for name, micros in report['encode_us'].items():
+            print(f'  encode {name:<10}{micros:>10} us')
+        print(f"  {'identity':<17}{report['bytes']['identity']:>10} bytes")
+        for encoding, micros in report['compress_us'].items():
+            print(f"  {encoding:<17}{report['bytes'][encoding]:>10} bytes{micros:>10} us to compress")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print('No regressions against baseline')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+DATA_URL_PATTERN = re.compile(r'^data:([\w.+-]+/[\w.+-]+)?(?:;[\w.+-]+=[\w.+-]+)*;base64,', re.IGNORECASE)
+
+# Media types accepted into the store, with the extension their URLs carry.
+# Blobs are served from the API origin, so only types a browser renders
+# inertly are allowed: no HTML, SVG, or other scriptable documents.
+MEDIA_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'video/mp4': '.mp4',
+    'video/webm': '.webm',
+    'video/quicktime': '.mov',
+    'audio/mpeg': '.mp3',
+    'audio/ogg': '.oga',
+    'audio/wav': '.wav',
+    'audio/mp4': '.m4a',
+    'audio/aac': '.aac',
+    'audio/flac': '.flac',
+}
+EXTENSION_MEDIA_TYPES = {extension: mimetype for mimetype, extension in MEDIA_EXTENSIONS.items()}
+
+
+class LocalBlobStore:
+    """Content-addressed blob storage on the local filesystem.
+
+    Blobs are keyed by the SHA-256 of their contents and stored as
+    ``<root>/<aa>/<bb>/<digest>``, so identical uploads are stored once.
+    Writes go to a temporary file first and are renamed into place, which
+    keeps concurrent writers of the same content from seeing partial files.
+    """
+
+    def __init__(self, root, chunk_size=64 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+
+    def path(self, digest):
+        if not DIGEST_PATTERN.match(digest):
+            raise ValueError('Invalid blob digest')
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def save_stream(self, stream):
+        """Copy a file-like object into the store chunk by chunk; return its digest."""
+        os.makedirs(self.root, exist_ok=True)
+        sha256 = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b''):
+                    sha256.update(chunk)
+                    tmp.write(chunk)
+
+            digest = sha256.hexdigest()
+            path = self.path(digest)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return digest
+
+    def save_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if not self.exists(digest):
+            self.save_stream(BytesIO(data))
+        return digest
+
+
+def media_extension(mimetype):
+    """Return the URL extension of an accepted media type; ValueError for any other type."""
+    if mimetype not in MEDIA_EXTENSIONS:
+        raise ValueError(f'Unsupported media type {mimetype!r}')
+    return MEDIA_EXTENSIONS[mimetype]
+
+
+def parse_blob_name(name):
+    """Split a blob URL name, ``<digest><extension>``, into ``(digest, mimetype)``.
+
+    Raises ValueError unless the extension is the canonical one of an
+    accepted media type, so a blob is only ever served as such a type.
+    """
+    digest, dot, extension = name.partition('.')
+    mimetype = EXTENSION_MEDIA_TYPES.get(dot + extension.lower()) if dot else None
+    if mimetype is None or not DIGEST_PATTERN.match(digest):
+        raise ValueError('Invalid blob name')
+    return digest, mimetype
+
+
+def is_data_url(value):
+    return isinstance(value, str) and DATA_URL_PATTERN.match(value) is not None
+
+
+def decode_data_url(value):
+    """Split a base64 ``data:`` URL into ``(mimetype, bytes)``.
+
+    Raises ValueError if the payload is not valid base64.
+    """
+    match = DATA_URL_PATTERN.match(value)
+    if not match:
+        raise ValueError('Not a base64 data URL')
+
+    try:
+        data = base64.b64decode(value[match.end():], validate=True)
+    except binascii.Error as e:
+        raise ValueError('Invalid base64 data') from e
+
+    return (match.group(1) or 'application/octet-stream').lower(), data
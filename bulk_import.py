@@ -0,0 +1,194 @@
+"""Bulk loading of users, murmurs, follows and likes from NDJSON or CSV files.
+
+Records are read in batches and inserted with one statement per batch,
+without the per-row existence queries of the API routes:
+
+* SQLite: executemany ``INSERT ... ON CONFLICT DO NOTHING``
+* Postgres: ``COPY`` into a temporary table, then
+  ``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` into the real one
+
+Rows that collide with an existing primary key or unique constraint (a user
+already imported, a duplicate like or follow) are skipped by the database.
+Rows missing a required column are rejected before insert and counted.
+Each batch commits on its own and its end position is written to a JSON
+checkpoint file, so an interrupted import resumes where it stopped;
+replaying a batch that committed before the checkpoint was saved is
+harmless because of the conflict handling.
+
+Files ending in ``.csv`` (optionally ``.gz``) are read as CSV with a header
+row; anything else as NDJSON. Timestamps are ISO 8601; empty CSV fields are
+NULL. Counter columns are not trusted; recompute them after importing.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import Integer, DateTime, insert, text
+from sqlalchemy.dialects import sqlite
+
+COPY_NULL = '\\N'
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(path):
+    with open_text(path) as f:
+        if path.removesuffix('.gz').endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def coerce(table, record, defaults):
+    """Return the record as a full row of ``table``, or None if it lacks a required column.
+
+    Raises ValueError for values that don't parse as the column's type.
+    """
+    row = {}
+    for column in table.columns:
+        value = record.get(column.name)
+        if value == '' or value is None:
+            value = defaults.get(column.name)
+            if value is None and not column.nullable and not column.primary_key:
+                return None
+        elif isinstance(column.type, Integer):
+            value = int(value)
+        elif isinstance(column.type, DateTime) and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.positions = json.load(f)
+
+    def position(self, key):
+        return self.positions.get(key, 0)
+
+    def advance(self, key, position):
+        self.positions[key] = position
+        if self.path:
+            # Write-then-rename so a crash never leaves a truncated checkpoint
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.positions, f)
+            os.replace(self.path + '.tmp', self.path)
+
+
+def copy_insert(connection, table, rows):
+    # COPY the batch into an unconstrained temporary copy of the table, then
+    # move it over, skipping conflicting rows. Rows without an id take the next
+    # value of the table's sequence.
+    columns = [column.name for column in table.columns]
+    column_list = ', '.join(columns)
+    select_list = ', '.join(
+        f"coalesce(id, nextval(pg_get_serial_sequence('{table.name}', 'id')))" if name == 'id' else name
+        for name in columns
+    )
+    staging = f'import_{table.name}'
+    connection.execute(text(
+        f'CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS SELECT * FROM {table.name} WITH NO DATA'
+    ))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([COPY_NULL if row[name] is None else row[name] for name in columns])
+    buffer.seek(0)
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer)
+    finally:
+        cursor.close()
+
+    result = connection.execute(text(
+        f'INSERT INTO {table.name} ({column_list}) SELECT {select_list} FROM {staging} ON CONFLICT DO NOTHING'
+    ))
+    return result.rowcount
+
+
+def insert_batch(connection, table, rows):
+    """Insert ``rows`` ignoring conflicts; returns the number inserted (or -1 if unknown)."""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        return copy_insert(connection, table, rows)
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(table).on_conflict_do_nothing()
+    else:
+        # No portable conflict clause: duplicates abort the batch
+        stmt = insert(table)
+    return connection.execute(stmt, rows).rowcount
+
+
+def reset_sequence(connection, table):
+    # Explicit ids don't advance Postgres sequences; move the sequence past the
+    # highest id so later rows without one (and the API) don't collide
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table.name}"
+        ))
+
+
+def import_file(engine, table, path, batch_size=5000, checkpoint=None, defaults=None, prepare=None):
+    """Load one file into ``table``; returns counts of read, inserted and rejected rows.
+
+    ``defaults`` fills columns missing from a record (callables are called once
+    per batch); ``prepare`` may rewrite each raw record first.
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    key = f'{table.name}:{os.path.abspath(path)}'
+    start = checkpoint.position(key)
+    stats = {'read': 0, 'inserted': 0, 'rejected': 0, 'resumed_at': start}
+
+    records = read_records(path)
+    for _ in range(start):
+        next(records, None)
+    position = start
+
+    for batch in batches(records, batch_size):
+        batch_defaults = {name: value() if callable(value) else value for name, value in (defaults or {}).items()}
+        rows = []
+        for record in batch:
+            try:
+                row = coerce(table, prepare(record) if prepare else record, batch_defaults)
+            except (TypeError, ValueError):
+                row = None
+            if row is None:
+                stats['rejected'] += 1
+            else:
+                rows.append(row)
+
+        if rows:
+            with engine.begin() as connection:
+                stats['inserted'] += max(insert_batch(connection, table, rows), 0)
+                reset_sequence(connection, table)
+        position += len(batch)
+        stats['read'] += len(batch)
+        checkpoint.advance(key, position)
+
+    return stats
@@ -0,0 +1,119 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+``ResponseCompressor`` compresses responses after the view has run, using
+brotli when the ``brotli`` package is installed (the ``brotli`` extra) and
+the client accepts it, and gzip otherwise. Responses are left alone when they are:
+
+* smaller than ``min_size`` bytes (the headers would outweigh the savings)
+* already encoded (such as the gzipped export stream)
+* Server-Sent Events, which must reach the client one event at a time
+* images, audio or video, which are compressed already
+* files sent from disk, or marked ``Cache-Control: no-transform``
+
+Streamed responses are compressed chunk by chunk as they are produced,
+without buffering the whole body. A compressed response gets a weak ETag (the bytes differ
+from the uncompressed ones) and ``Vary: Accept-Encoding``.
+
+``precompress`` encodes a body ahead of time, so the response cache can
+keep a compressed copy next to the plain one and skip the work on hits.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first when the client accepts both with the same quality
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+UNCOMPRESSIBLE_TYPES = ('image/', 'audio/', 'video/')
+GZIP_WBITS = 31  # zlib container: gzip header and trailer
+
+
+def choose_encoding(accept_encodings, encodings=ENCODINGS):
+    # Highest client quality wins; ties go to the server's preference order
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class ResponseCompressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, GZIP_WBITS)
+        return compressor.compress(body) + compressor.flush()
+
+    def precompress(self, body):
+        # Only the preferred encoding; other clients are compressed per request
+        if len(body) < self.min_size:
+            return {}
+        return {ENCODINGS[0]: self.compress(body, ENCODINGS[0])}
+
+    def compress_chunks(self, chunks, encoding):
+        # Each chunk is flushed through the compressor as soon as it is produced,
+        # so a slow stream keeps flowing instead of sitting in the compressor's
+        # buffer until it ends (at some cost in ratio for very small chunks)
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, GZIP_WBITS)
+            process, finish = compressor.compress, compressor.flush
+            flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+        try:
+            for chunk in chunks:
+                data = process(chunk.encode() if isinstance(chunk, str) else chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def is_compressible(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        if response.cache_control.no_transform:
+            return False
+        mimetype = response.mimetype or ''
+        return mimetype != 'text/event-stream' and not mimetype.startswith(UNCOMPRESSIBLE_TYPES)
+
+    def after_request(self, response):
+        if not self.is_compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_chunks(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            response.set_data(self.compress(body, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
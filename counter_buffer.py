@@ -0,0 +1,75 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Write-behind buffer that coalesces counter increments per key.
+
+    ``add`` only updates an in-memory delta; a background thread hands the
+    accumulated deltas to ``flush_func`` every ``interval`` seconds, so a
+    burst of N increments on one row becomes a single UPDATE. Deltas that
+    fail to flush are merged back and retried on the next tick. Pending
+    deltas are lost if the process dies before a flush.
+    """
+
+    def __init__(self, flush_func, interval=1.0):
+        self.flush_func = flush_func
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def add(self, key, delta):
+        """Record ``delta`` for ``key`` and return the key's pending total."""
+        with self._lock:
+            total = self._pending.get(key, 0) + delta
+            if total:
+                self._pending[key] = total
+            else:
+                self._pending.pop(key, None)
+        self._ensure_started()
+        return total
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending.get(key, 0)
+
+    def flush(self):
+        """Write out everything pending now; returns the flushed deltas."""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._pending = self._pending, {}
+            if not deltas:
+                return {}
+
+            try:
+                self.flush_func(deltas)
+            except Exception:
+                with self._lock:
+                    for key, delta in deltas.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                raise
+            return deltas
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='counter-buffer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Counter flush failed; deltas kept for the next attempt')
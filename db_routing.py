@@ -0,0 +1,84 @@
+"""Read-replica routing for the Flask-SQLAlchemy session.
+
+Replicas are configured as extra binds (``replica_0``, ``replica_1``, ...).
+A read route marks the request with ``g.db_replica``; while it is set,
+``RoutingSession.get_bind`` sends SELECTs to that replica. Flushes and DML
+statements always go to the primary, as does everything outside a marked
+request.
+
+Read-your-writes: after a user writes, their reads stay on the primary for
+``sticky_window`` seconds so they don't see replica lag. ``ReplicaRouter``
+remembers recent writers per process; the app also sets a cookie so the
+window holds across workers for browser clients. It also remembers which
+response cache tags were invalidated within the window, so a replica that
+hasn't caught up with the write can't refill the cache with the old data.
+"""
+import random
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.elements import TextClause
+
+READ_PREFIXES = ('SELECT', 'WITH')
+
+
+def is_write(clause):
+    if clause is None:
+        return False
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(READ_PREFIXES)
+    return bool(getattr(clause, 'is_dml', False))
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = g.get('db_replica') if has_app_context() else None
+        if replica is not None and bind is None and not self._flushing and not is_write(clause):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, sticky_window=5.0, max_writers=100000):
+        self.replicas = list(replicas)
+        self.sticky_window = sticky_window
+        self.max_writers = max_writers
+        self._lock = threading.Lock()
+        self._recent_writers = {}  # user id -> primary-until timestamp
+        self._recent_invalidations = {}  # cache tag -> timestamp the window ends
+
+    def choose(self):
+        return random.choice(self.replicas) if self.replicas else None
+
+    def mark_write(self, user_id):
+        now = time.time()
+        with self._lock:
+            if len(self._recent_writers) >= self.max_writers:
+                self._recent_writers = {key: until for key, until in self._recent_writers.items() if until > now}
+            self._recent_writers[user_id] = now + self.sticky_window
+
+    def mark_invalidated(self, tags):
+        if not self.replicas:
+            return
+        now = time.time()
+        with self._lock:
+            if len(self._recent_invalidations) >= self.max_writers:
+                self._recent_invalidations = {
+                    tag: until for tag, until in self._recent_invalidations.items() if until > now
+                }
+            for tag in tags:
+                self._recent_invalidations[tag] = now + self.sticky_window
+
+    def recently_invalidated(self, tags):
+        now = time.time()
+        with self._lock:
+            return any(self._recent_invalidations.get(tag, 0) > now for tag in tags)
+
+    def is_sticky(self, user_id):
+        if user_id is None:
+            return False
+        with self._lock:
+            until = self._recent_writers.get(user_id)
+        return until is not None and until > time.time()
@@ -0,0 +1,84 @@
+"""In-process publish/subscribe broker for the Server-Sent Events stream.
+
+Subscribers register for a set of topics (``user:<id>`` for new murmurs by an
+account, ``murmur:<id>`` for like count changes) and each gets its own bounded
+queue. ``publish`` formats the event once and hands the same bytes to every
+matching queue without blocking: a subscriber whose queue is full is marked
+as overflowed and its stream is told to reset (reload and reconnect) instead
+of slowing down the publisher or growing without bound.
+
+Events only reach subscribers connected to the same process. Streams hold a
+connection open, so serve them from an async worker class (for example
+``gunicorn -k gevent``, where the queue waits are cooperative) rather than
+one OS thread per client.
+"""
+import json
+import queue
+import threading
+
+OVERFLOWED = object()
+
+
+def format_event(event_type, data):
+    return f'event: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+class Subscription:
+    def __init__(self, topics, max_queue):
+        self.topics = frozenset(topics)
+        self.overflowed = False
+        self._queue = queue.Queue(max_queue)
+
+    def put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next formatted event, None after ``timeout`` seconds, or OVERFLOWED."""
+        if self.overflowed:
+            return OVERFLOWED
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return OVERFLOWED if self.overflowed else None
+
+
+class EventBroker:
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._topics = {}  # topic -> set of subscriptions
+
+    def subscribe(self, topics):
+        subscription = Subscription(topics, self.max_queue)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def publish(self, topic, event_type, data):
+        """Queue an event for the topic's subscribers; returns how many got it."""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+
+        message = format_event(event_type, data)
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({subscription for subscribers in self._topics.values() for subscription in subscribers})
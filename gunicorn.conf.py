@@ -0,0 +1,45 @@
+"""Gunicorn settings for the Flask API (``gunicorn -c gunicorn.conf.py``).
+
+The app is imported once in the master (``preload_app``) and workers are
+forked from it, so spawning or replacing a worker doesn't re-import Flask and
+SQLAlchemy. Connections opened before the fork must not be shared between
+processes; ``post_fork`` drops the inherited pools and every worker opens its
+own (sized by DATABASE_POOL_SIZE / DATABASE_MAX_OVERFLOW).
+
+Workers are gevent workers by default: every SSE stream holds its connection
+open, and with greenlets thousands of idle streams share one worker instead
+of each pinning a sync worker until the timeout kills it. gevent's monkey
+patching happens here, before the app is preloaded, so the locks and queues
+created at import time cooperate with the event loop; psycopg2 is made
+cooperative through psycogreen. GUNICORN_WORKER_CLASS=sync switches back
+(without live updates at any scale).
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    from app import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the parent's connections alone; the worker
+            # just stops using them and opens fresh ones
+            engine.dispose(close=False)
@@ -0,0 +1,181 @@
+"""Per-request SQL and latency instrumentation.
+
+Hooks SQLAlchemy engine events to count the statements each request runs,
+their total time and the slowest one, tagged with the Flask endpoint. The
+numbers are aggregated into histograms served in Prometheus text format at
+``/metrics`` and summarised in a ``Server-Timing`` header on every response.
+
+With an N+1 threshold set, a request that runs the same statement template
+more than that many times is logged as a likely N+1 query; with a slow query
+threshold set, the slowest statement of a request is logged when it took
+longer than that.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+# Expanded IN lists differ in length between requests; collapse them so the
+# same statement always maps to the same template
+IN_LIST_PATTERN = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|:\w+)\s*\)')
+
+
+def statement_template(statement):
+    return IN_LIST_PATTERN.sub('(...)', ' '.join(statement.split()))
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [bucket counts, sum, count]
+
+    def observe(self, labels, value):
+        labels = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (bucket_counts, total, count) in sorted(self._series.items()):
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+                lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines)
+
+
+class CounterMetric:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._series = Counter()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._series[tuple(sorted(labels.items()))] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._series.items()):
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f'{self.name}{{{label_text}}} {value}')
+        return '\n'.join(lines)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest = (0.0, None)
+        self.templates = Counter()
+        self.engines = Counter()
+
+
+class Instrumentation:
+    def __init__(self, n_plus_one_threshold=None, slow_query_threshold=None):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_threshold = slow_query_threshold
+        self.logger = None
+        self.request_duration = Histogram(
+            'murmur_request_duration_seconds', 'Request latency by endpoint.', DURATION_BUCKETS)
+        self.request_queries = Histogram(
+            'murmur_request_sql_queries', 'SQL statements per request by endpoint.', QUERY_COUNT_BUCKETS)
+        self.request_sql_time = Histogram(
+            'murmur_request_sql_seconds', 'Total SQL time per request by endpoint.', DURATION_BUCKETS)
+        self.slowest_query = Histogram(
+            'murmur_request_slowest_sql_seconds', 'Slowest SQL statement per request by endpoint.', DURATION_BUCKETS)
+        self.engine_queries = CounterMetric(
+            'murmur_sql_queries_total', 'SQL statements by endpoint and database engine (primary or replica).')
+
+    def init_app(self, app, engines):
+        """Instrument ``app`` and every engine in ``engines`` (name -> Engine)."""
+        for name, engine in engines.items():
+            self.instrument_engine(engine, name)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        self.logger = app.logger
+
+    def instrument_engine(self, engine, name):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['query_started'].pop()
+            stats = g.get('request_stats') if has_request_context() else None
+            if stats is None:
+                return
+
+            stats.queries += 1
+            stats.sql_time += elapsed
+            stats.engines[name] += 1
+            stats.templates[statement_template(statement)] += 1
+            if elapsed > stats.slowest[0]:
+                stats.slowest = (elapsed, statement)
+
+    def _before_request(self):
+        g.request_stats = RequestStats()
+
+    def _after_request(self, response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+
+        duration = time.perf_counter() - stats.started
+        labels = {'endpoint': request.endpoint or 'unmatched'}
+        self.request_duration.observe(labels, duration)
+        self.request_queries.observe(labels, stats.queries)
+        self.request_sql_time.observe(labels, stats.sql_time)
+        self.slowest_query.observe(labels, stats.slowest[0])
+        for name, count in stats.engines.items():
+            self.engine_queries.inc({**labels, 'engine': name}, count)
+
+        engines = ', '.join(f'{name}={count}' for name, count in sorted(stats.engines.items()))
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.sql_time * 1000:.2f};desc="{stats.queries} queries{" on " + engines if engines else ""}", '
+            f'app;dur={duration * 1000:.2f}'
+        )
+
+        if self.slow_query_threshold and stats.slowest[0] > self.slow_query_threshold:
+            self.logger.warning('Slow query in %s (%.1f ms): %s',
+                                labels['endpoint'], stats.slowest[0] * 1000, statement_template(stats.slowest[1]))
+
+        if self.n_plus_one_threshold:
+            for template, count in stats.templates.items():
+                if count > self.n_plus_one_threshold:
+                    self.logger.warning(
+                        'Possible N+1 in %s: statement ran %d times: %s', labels['endpoint'], count, template)
+
+        return response
+
+    def metrics_view(self):
+        body = '\n'.join(histogram.render() for histogram in (
+            self.request_duration, self.request_queries, self.request_sql_time, self.slowest_query, self.engine_queries
+        )) + '\n'
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4'}
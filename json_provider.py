@@ -0,0 +1,68 @@
+"""JSON encoding for request and response bodies.
+
+``OrjsonProvider`` plugs orjson into Flask's JSON interface (``jsonify``,
+``request.get_json``), which serializes feed pages several times faster than
+the stdlib ``json`` module. It keeps the stdlib provider's behaviour where
+it is visible to clients: keys are sorted, datetimes and other extra types
+go through Flask's ``default`` hook, and responses are indented in debug
+mode. Unlike the stdlib provider, non-ASCII text is written as UTF-8
+instead of ``\\u`` escapes.
+
+orjson is a declared dependency; in an environment that lacks it anyway,
+``provider_class`` logs a warning and returns Flask's stdlib provider.
+"""
+import logging
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def _options(self, indent=False):
+        # Datetimes are passed through to `default` to keep Flask's HTTP-date format
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for stdlib-specific arguments get the stdlib encoder
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Encode straight to bytes, skipping the str round trip of the base class
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+PROVIDERS = {
+    'stdlib': DefaultJSONProvider,
+    'orjson': OrjsonProvider,
+}
+
+
+def provider_class(name):
+    """Return the provider registered as ``name``, falling back to the stdlib one."""
+    if name not in PROVIDERS:
+        raise ValueError(f'Unknown JSON provider {name!r} (expected one of {", ".join(PROVIDERS)})')
+    if name == 'orjson' and orjson is None:
+        logger.warning('orjson is not installed; using the stdlib JSON provider')
+        return DefaultJSONProvider
+    return PROVIDERS[name]
@@ -0,0 +1,124 @@
+"""Versioned schema migrations for existing SQLite and Postgres databases.
+
+``db.create_all()`` only creates missing tables, so columns and indexes added
+to existing tables are applied here instead. Each migration runs once, in its
+own transaction, and is recorded in the ``schema_migrations`` table. They are
+written to be safe on a database that ``create_all()`` already brought up to
+date, so fresh and old deployments both end up with the same schema.
+
+Run them with ``flask db-upgrade``.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from user_search import PG_DOCUMENT
+
+MIGRATIONS = []
+
+
+def migration(name):
+    def decorator(func):
+        MIGRATIONS.append((name, func))
+        return func
+    return decorator
+
+
+def add_column(connection, table, column, ddl):
+    if column not in {c['name'] for c in inspect(connection).get_columns(table)}:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+
+
+@migration('0001_add_counter_columns')
+def add_counter_columns(connection):
+    for table, column in [('users', 'followers_count'), ('users', 'following_count'),
+                          ('users', 'murmurs_count'), ('murmurs', 'likes_count')]:
+        add_column(connection, table, column, 'INTEGER NOT NULL DEFAULT 0')
+
+    # Backfill from the source tables
+    connection.execute(text("""
+        UPDATE users SET
+            followers_count = (SELECT COUNT(*) FROM follows WHERE follows.followed_id = users.id),
+            following_count = (SELECT COUNT(*) FROM follows WHERE follows.follower_id = users.id),
+            murmurs_count = (SELECT COUNT(*) FROM murmurs WHERE murmurs.user_id = users.id)
+    """))
+    connection.execute(text("""
+        UPDATE murmurs SET likes_count = (SELECT COUNT(*) FROM likes WHERE likes.murmur_id = murmurs.id)
+    """))
+
+
+@migration('0002_add_hot_path_indexes')
+def add_hot_path_indexes(connection):
+    # Each index matches one access pattern:
+    #   user murmurs and the timeline IN filter, newest first
+    #   global feed and keyset pages ordered by (created_at, id)
+    #   follower lookups for fan-out and follower listings
+    #   cursor pages of follower/following listings
+    #   like lookups by murmur
+    # On large Postgres tables consider creating these by hand with
+    # CREATE INDEX CONCURRENTLY first; IF NOT EXISTS makes this a no-op then.
+    statements = [
+        'CREATE INDEX IF NOT EXISTS ix_murmurs_user_id_created_at ON murmurs (user_id, created_at DESC, id DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_murmurs_created_at_id ON murmurs (created_at DESC, id DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_follows_followed_id_follower_id ON follows (followed_id, follower_id)',
+        'CREATE INDEX IF NOT EXISTS ix_follows_followed_id_created_at ON follows (followed_id, created_at DESC, id DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_follows_follower_id_created_at ON follows (follower_id, created_at DESC, id DESC)',
+        'CREATE INDEX IF NOT EXISTS ix_likes_murmur_id_user_id ON likes (murmur_id, user_id)',
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+@migration('0003_add_user_search_index')
+def add_user_search_index(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS ix_users_search_document ON users USING gin (({PG_DOCUMENT}))'))
+        connection.execute(text('CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops)'))
+    elif connection.dialect.name == 'sqlite':
+        # Kept in sync by the register/update_profile routes. If this SQLite
+        # build has no FTS5, search falls back to unindexed LIKE queries.
+        try:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(name, username, bio, tokenize = 'unicode61')"
+            ))
+        except OperationalError:
+            return
+        connection.execute(text('DELETE FROM users_fts'))
+        connection.execute(text(
+            "INSERT INTO users_fts (rowid, name, username, bio) SELECT id, name, username, coalesce(bio, '') FROM users"
+        ))
+
+
+@migration('0004_add_likes_created_at_index')
+def add_likes_created_at_index(connection):
+    # Recent likes for rebuilding the trending index; covers murmur_id too
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_likes_created_at_murmur_id ON likes (created_at, murmur_id)'))
+
+
+def applied_migrations(engine):
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR(255) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)'
+        ))
+        return {row[0] for row in connection.execute(text('SELECT name FROM schema_migrations'))}
+
+
+def upgrade(engine):
+    """Apply pending migrations in order and return the names applied."""
+    done = applied_migrations(engine)
+    applied = []
+    for name, func in MIGRATIONS:
+        if name in done:
+            continue
+
+        with engine.begin() as connection:
+            func(connection)
+            connection.execute(
+                text('INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :applied_at)'),
+                {'name': name, 'applied_at': datetime.utcnow()}
+            )
+        applied.append(name)
+
+    return applied
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A cached representation: the serialized body, its ETag and compressed copies
+# of the body keyed by content coding (e.g. {'gzip': ...})
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag', 'encoded'])
+
+
+class ResponseCache:
+    """Interface for caching serialized responses.
+
+    Entries carry tags naming the records they were built from (for example
+    ``murmur:12`` or ``user:3``), so write routes can drop exactly the entries
+    that embed a changed record with ``invalidate_tags``.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, tags=(), ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LRUCache(ResponseCache):
+    """Process-local LRU cache with per-entry TTL.
+
+    Evicts least recently used entries once either ``max_entries`` or
+    ``max_bytes`` (the summed body sizes) is exceeded.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, default_ttl=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, tags, expires_at, size)
+        self._tags = {}  # tag -> set of keys
+        self._size = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, tags=(), ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = len(value.body) + sum(map(len, value.encoded.values())) if hasattr(value, 'body') else 0
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            tags = frozenset(tags)
+            self._entries[key] = (value, tags, expires_at, size)
+            self._size += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        _, tags, _, size = self._entries.pop(key)
+        self._size -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
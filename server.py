@@ -1,4 +1,9 @@
-from app import app
+from app import create_app, init_db
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
+    # Development server; creates the schema on start for convenience.
+    # Production runs wsgi:app under gunicorn (see gunicorn.conf.py).
+    app = create_app()
+    with app.app_context():
+        init_db()
+    app.run(host='0.0.0.0', port=8000, debug=True)
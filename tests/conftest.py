@@ -0,0 +1,46 @@
+import pytest
+
+import app as murmur
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = murmur.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/murmur.db',
+        'BLOB_STORAGE_PATH': str(tmp_path / 'blobs'),
+        'TRENDING_SNAPSHOT_PATH': str(tmp_path / 'trending.json'),
+        'SECRET_KEY': 'test',
+    })
+    with app.app_context():
+        murmur.init_db()
+    yield app
+    with app.app_context():
+        murmur.db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    # Users 1..users, each following the next `follows` users, with `murmurs`
+    # murmurs spread round-robin over the authors
+    def seed(users=10, murmurs=0, follows=0):
+        with app.app_context():
+            db = murmur.db
+            db.session.add_all([
+                murmur.User(name=f'User {i}', username=f'user{i}', email=f'user{i}@example.com', password_hash='x')
+                for i in range(1, users + 1)
+            ])
+            db.session.add_all([
+                murmur.Follow(follower_id=i, followed_id=(i + offset - 1) % users + 1)
+                for i in range(1, users + 1) for offset in range(1, follows + 1)
+            ])
+            db.session.add_all([
+                murmur.Murmur(content=f'Murmur {i}', user_id=i % users + 1) for i in range(murmurs)
+            ])
+            db.session.commit()
+            murmur.repair_counters()
+    return seed
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from auth_tokens import InvalidToken, TokenSigner
+
+SECRET = 'a-test-secret-that-is-32-bytes-x'
+
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def post_murmur(client, content, user_id=None, token=None):
+    body = {'content': content}
+    if user_id is not None:
+        body['user_id'] = user_id
+    return client.post('/api/me/murmurs', json=body, headers=bearer(token) if token else {})
+
+
+def test_token_round_trip():
+    signer = TokenSigner(SECRET, ttl=60)
+    token, expires_at = signer.issue(7)
+    assert signer.user_id(token) == 7
+    assert expires_at == pytest.approx(time.time() + 60, abs=2)
+
+
+def test_expired_and_forged_tokens_are_rejected():
+    expired, _ = TokenSigner(SECRET, ttl=-1).issue(7)
+    with pytest.raises(InvalidToken, match='expired'):
+        TokenSigner(SECRET).verify(expired)
+
+    forged, _ = TokenSigner(SECRET[::-1]).issue(7)
+    with pytest.raises(InvalidToken, match='Invalid'):
+        TokenSigner(SECRET).verify(forged)
+
+
+def test_revoked_token_is_rejected():
+    signer = TokenSigner(SECRET)
+    token, _ = signer.issue(7)
+    signer.revoke(token)
+    with pytest.raises(InvalidToken, match='revoked'):
+        signer.verify(token)
+
+
+def test_login_and_logout(client):
+    response = client.post('/api/auth/register', json={
+        'name': 'Ada', 'username': 'ada', 'email': 'ada@example.com', 'password': 'pw'
+    })
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['id']
+    assert client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'nope'}).status_code == 401
+
+    token = client.post('/api/auth/login', json={'email': 'ada@example.com', 'password': 'pw'}).get_json()['token']
+    response = post_murmur(client, 'hello', token=token)
+    assert response.status_code == 201
+    assert response.get_json()['murmur']['user_id'] == user_id
+
+    assert client.post('/api/auth/logout', headers=bearer(token)).status_code == 200
+    response = post_murmur(client, 'again', token=token)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token revoked'
+    assert client.post('/api/auth/logout', headers=bearer(token)).status_code == 401
+
+
+def test_token_takes_precedence_over_user_id(app, client, seed):
+    seed(users=2)
+    token, _ = app.extensions['murmur']['token_signer'].issue(2)
+    response = post_murmur(client, 'mine', user_id=1, token=token)
+    assert response.status_code == 201
+    assert response.get_json()['murmur']['user_id'] == 2
+
+    # A bad token is an error, not a reason to fall back to user_id
+    assert post_murmur(client, 'forged', user_id=1, token='not-a-token').status_code == 401
+
+
+def test_legacy_user_id_can_be_disabled(app, client, seed):
+    seed(users=1)
+    assert post_murmur(client, 'legacy', user_id=1).status_code == 201
+
+    app.config['AUTH_ALLOW_USER_ID'] = False
+    assert post_murmur(client, 'legacy', user_id=1).status_code == 401
+    token, _ = app.extensions['murmur']['token_signer'].issue(1)
+    assert post_murmur(client, 'token', token=token).status_code == 201
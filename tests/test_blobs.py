@@ -0,0 +1,43 @@
+import base64
+
+import pytest
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 32
+HTML = b'<script>alert(document.domain)</script>'
+
+
+def data_url(mimetype, data):
+    return f'data:{mimetype};base64,{base64.b64encode(data).decode()}'
+
+
+def post_media(client, media_url):
+    return client.post('/api/me/murmurs', json={'user_id': 1, 'media_type': 'image', 'media_url': media_url})
+
+
+@pytest.mark.parametrize('mimetype', ['text/html', 'image/svg+xml', 'application/xhtml+xml', 'application/octet-stream'])
+def test_scriptable_data_urls_are_rejected(client, seed, mimetype):
+    seed(users=1)
+    assert post_media(client, data_url(mimetype, HTML)).status_code == 400
+
+
+def test_profile_image_must_be_an_image(client, seed):
+    seed(users=1)
+    response = client.put('/api/me/profile', json={'user_id': 1, 'profile_image': data_url('video/mp4', PNG)})
+    assert response.status_code == 400
+
+
+def test_blobs_are_served_only_as_their_stored_type(client, seed):
+    seed(users=1)
+    # HTML smuggled in as a PNG is still just a PNG
+    url = post_media(client, data_url('image/png', HTML)).get_json()['murmur']['media_url']
+    assert url.endswith('.png')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert response.headers['Content-Security-Policy'] == 'sandbox'
+
+    digest = url.rsplit('/', 1)[1].split('.')[0]
+    for name in (f'{digest}.html', f'{digest}.svg', f'{digest}.jpeg', digest):
+        assert client.get(f'/api/blobs/{name}').status_code == 404
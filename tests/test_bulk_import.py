@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import app as murmur
+import bulk_import
+
+USERS = [
+    {'id': 1, 'name': 'Ada Lovelace', 'username': 'ada', 'email': 'ada@example.com', 'password': 'pw'},
+    {'id': 2, 'name': 'Grace Hopper', 'username': 'grace', 'email': 'grace@example.com', 'password_hash': 'x'},
+    {'id': 3, 'name': 'Alan Turing', 'username': 'alan', 'email': 'alan@example.com', 'password_hash': 'x'},
+    {'id': 4, 'name': 'No Email', 'username': 'noemail', 'password_hash': 'x'},  # rejected
+]
+MURMURS_CSV = 'id,user_id,content,created_at\n1,1,First,2024-01-01T00:00:00\n2,1,Second,\n3,2,Third,\n'
+FOLLOWS = [
+    {'follower_id': 2, 'followed_id': 1},
+    {'follower_id': 3, 'followed_id': 1},
+    {'follower_id': 2, 'followed_id': 1},  # duplicate
+]
+LIKES = [{'user_id': 2, 'murmur_id': 1}, {'user_id': 3, 'murmur_id': 1}, {'user_id': 3, 'murmur_id': 3}]
+# Counter columns are required; the import-data command fills them the same way
+COUNTERS = {'followers_count': 0, 'following_count': 0, 'murmurs_count': 0, 'likes_count': 0}
+
+
+def write_ndjson(path, records):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    murmurs = tmp_path / 'murmurs.csv'
+    murmurs.write_text(MURMURS_CSV)
+    return {
+        'users': write_ndjson(tmp_path / 'users.ndjson', USERS),
+        'murmurs': str(murmurs),
+        'follows': write_ndjson(tmp_path / 'follows.ndjson', FOLLOWS),
+        'likes': write_ndjson(tmp_path / 'likes.ndjson', LIKES),
+    }
+
+
+def import_data(app, files, checkpoint):
+    args = ['import-data', '--batch-size', '2', '--checkpoint', str(checkpoint)]
+    for name, path in files.items():
+        args += [f'--{name}', path]
+    result = app.test_cli_runner().invoke(args=args)
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def table_counts(app):
+    with app.app_context():
+        return {model.__tablename__: model.query.count() for model in (murmur.User, murmur.Murmur, murmur.Follow, murmur.Like)}
+
+
+def test_import_skips_duplicates_and_rebuilds_counters(app, client, files, tmp_path):
+    output = import_data(app, files, tmp_path / 'first.json')
+    assert 'users: 4 read, 3 inserted, 1 rejected' in output
+    assert 'follows: 3 read, 2 inserted, 0 rejected' in output
+    counts = {'users': 3, 'murmurs': 3, 'follows': 2, 'likes': 3}
+    assert table_counts(app) == counts
+
+    # Importing the same files again (fresh checkpoint) inserts nothing
+    output = import_data(app, files, tmp_path / 'second.json')
+    assert 'users: 4 read, 0 inserted, 1 rejected' in output
+    assert table_counts(app) == counts
+
+    # Counters and the search index were rebuilt after the import
+    with app.app_context():
+        ada = murmur.db.session.get(murmur.User, 1)
+        assert (ada.followers_count, ada.murmurs_count) == (2, 2)
+        assert murmur.db.session.get(murmur.Murmur, 1).likes_count == 2
+        assert ada.check_password('pw')
+    response = client.get('/api/users/search?q=grace')
+    assert [user['username'] for user in response.get_json()['users']] == ['grace']
+
+
+def test_interrupted_import_resumes_from_the_checkpoint(app, files, tmp_path):
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    with app.app_context():
+        engine, table = murmur.db.engine, murmur.User.__table__
+
+    # Dies in the second batch, after the first one committed
+    seen = []
+    def interrupt_after_two(record):
+        seen.append(record)
+        if len(seen) > 2:
+            raise KeyboardInterrupt
+        return murmur.hash_import_password(record)
+    with pytest.raises(KeyboardInterrupt):
+        bulk_import.import_file(engine, table, files['users'], batch_size=2,
+                                checkpoint=bulk_import.Checkpoint(checkpoint_path),
+                                defaults=COUNTERS, prepare=interrupt_after_two)
+    assert table_counts(app)['users'] == 2
+
+    stats = bulk_import.import_file(engine, table, files['users'], batch_size=2,
+                                    checkpoint=bulk_import.Checkpoint(checkpoint_path),
+                                    defaults=COUNTERS, prepare=murmur.hash_import_password)
+    assert stats == {'read': 2, 'inserted': 1, 'rejected': 1, 'resumed_at': 2}
+    with app.app_context():
+        assert [user.username for user in murmur.User.query.order_by(murmur.User.id)] == ['ada', 'grace', 'alan']
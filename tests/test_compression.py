@@ -0,0 +1,54 @@
+import gzip
+import zlib
+
+import pytest
+from werkzeug.http import parse_accept_header
+
+from compression import ResponseCompressor, choose_encoding
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, br', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('br', 'br'),
+    ('identity', None),
+    ('gzip;q=0', None),
+    ('', None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(parse_accept_header(header), ('br', 'gzip')) == expected
+
+
+def test_compressed_responses_get_a_weak_etag(client, seed):
+    seed(users=5, murmurs=40)
+    plain = client.get('/api/murmurs', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert not plain.headers['ETag'].startswith('W/')
+
+    compressed = client.get('/api/murmurs', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert compressed.headers['ETag'] == f"W/{plain.headers['ETag']}"
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+
+    revalidated = client.get('/api/murmurs', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']
+    })
+    assert revalidated.status_code == 304
+
+
+def test_small_responses_are_not_compressed(client, seed):
+    seed(users=1)
+    response = client.get('/api/users/1', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_streamed_chunks_are_flushed_as_they_arrive():
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    compressed = ResponseCompressor().compress_chunks(iter([b'{"first": 1}\n', b'{"second": 2}\n']), 'gzip')
+    # Each chunk can be decoded before the next one is produced
+    assert decompressor.decompress(next(compressed)) == b'{"first": 1}\n'
+    assert decompressor.decompress(next(compressed)) == b'{"second": 2}\n'
+    assert decompressor.decompress(b''.join(compressed)) == b''
+    assert decompressor.eof
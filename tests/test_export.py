@@ -0,0 +1,16 @@
+import json
+
+
+def test_export_requires_a_token(client, seed):
+    seed(users=2, murmurs=2, follows=1)
+    assert client.get('/api/me/export?user_id=1').status_code == 401
+
+
+def test_export_streams_the_callers_data(app, client, seed):
+    seed(users=2, murmurs=2, follows=1)
+    token, _ = app.extensions['murmur']['token_signer'].issue(1)
+    response = client.get('/api/me/export', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert records[0]['type'] == 'user' and records[0]['id'] == 1
+    assert {record['type'] for record in records[1:]} == {'murmur', 'following', 'follower'}
@@ -0,0 +1,87 @@
+import pytest
+
+import app as murmur
+
+
+@pytest.fixture
+def write_behind_app(tmp_path):
+    app = murmur.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/murmur.db',
+        'SECRET_KEY': 'test',
+        'LIKE_COUNTER_WRITE_BEHIND': True,
+        'LIKE_COUNTER_FLUSH_INTERVAL': 3600,
+    })
+    with app.app_context():
+        murmur.init_db()
+        murmur.db.session.add(murmur.User(name='User 1', username='user1', email='user1@example.com', password_hash='x'))
+        murmur.db.session.add(murmur.Murmur(content='Murmur', user_id=1))
+        murmur.db.session.commit()
+    yield app
+    with app.app_context():
+        murmur.db.engine.dispose()
+
+
+def like(client, murmur_id=1):
+    return client.post(f'/api/murmurs/{murmur_id}/like', json={'user_id': 1})
+
+
+def unlike(client, murmur_id=1):
+    return client.delete(f'/api/murmurs/{murmur_id}/unlike', json={'user_id': 1})
+
+
+def stored_likes_count(app, murmur_id=1):
+    with app.app_context():
+        return murmur.db.session.get(murmur.Murmur, murmur_id).likes_count
+
+
+def test_like_is_idempotent(app, client, seed):
+    seed(users=1, murmurs=1)
+    response = like(client)
+    assert response.status_code == 201
+    assert response.get_json()['likes_count'] == 1
+
+    response = like(client)
+    assert response.status_code == 200
+    assert response.get_json()['likes_count'] == 1
+    assert stored_likes_count(app) == 1
+
+
+def test_like_missing_murmur(client, seed):
+    seed(users=1)
+    assert like(client, murmur_id=42).status_code == 404
+
+
+def test_unlike_without_a_like_is_a_noop(app, client, seed):
+    seed(users=1, murmurs=1)
+    response = unlike(client)
+    assert response.status_code == 200
+    assert response.get_json()['likes_count'] == 0
+
+    like(client)
+    assert unlike(client).get_json()['likes_count'] == 0
+    assert unlike(client).get_json()['likes_count'] == 0
+    assert stored_likes_count(app) == 0
+
+
+def test_write_behind_flush_writes_buffered_counts(write_behind_app):
+    client = write_behind_app.test_client()
+    assert like(client).get_json()['likes_count'] == 1
+    assert like(client).get_json()['likes_count'] == 1
+    assert stored_likes_count(write_behind_app) == 0
+
+    buffer = write_behind_app.extensions['murmur']['like_counter_buffer']
+    assert buffer.flush() == {1: 1}
+    assert stored_likes_count(write_behind_app) == 1
+    assert unlike(client).get_json()['likes_count'] == 0
+    buffer.flush()
+    assert stored_likes_count(write_behind_app) == 0
+
+
+def test_write_behind_skips_likes_that_fail_to_commit(write_behind_app, monkeypatch):
+    def fail():
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(murmur.db.session, 'commit', fail)
+    assert like(write_behind_app.test_client()).status_code == 500
+
+    monkeypatch.undo()
+    assert write_behind_app.extensions['murmur']['like_counter_buffer'].pending(1) == 0
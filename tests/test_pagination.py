@@ -0,0 +1,28 @@
+import pytest
+
+CURSOR_URLS = [
+    '/api/murmurs?cursor=',
+    '/api/users/1/murmurs?cursor=',
+    '/api/users/1/followers?cursor=',
+    '/api/users/1/following?cursor=',
+    '/api/timeline?user_id=1&cursor=',
+]
+
+
+@pytest.mark.parametrize('url', CURSOR_URLS)
+@pytest.mark.parametrize('per_page', [0, -1])
+def test_cursor_pages_reject_empty_page_size(client, seed, url, per_page):
+    seed(users=3, murmurs=10, follows=2)
+    assert client.get(f'{url}&per_page={per_page}').status_code == 404
+
+
+@pytest.mark.parametrize('url', CURSOR_URLS)
+def test_cursor_pages_walk_to_the_end(client, seed, url):
+    seed(users=3, murmurs=10, follows=2)
+    key = 'murmurs' if 'murmurs' in url or 'timeline' in url else url.rsplit('/', 1)[1].split('?')[0]
+    seen, cursor = [], ''
+    while cursor is not None:
+        data = client.get(url.replace('cursor=', f'cursor={cursor}') + '&per_page=2').get_json()
+        seen += [item['id'] for item in data[key]]
+        cursor = data['next_cursor']
+    assert seen and len(seen) == len(set(seen))
@@ -0,0 +1,23 @@
+def test_compact_and_sparse_pages_are_smaller(client, seed):
+    # 40 murmurs by 5 authors, so every author appears on the page 8 times
+    seed(users=5, murmurs=40)
+
+    default = client.get('/api/murmurs?per_page=40')
+    compact = client.get('/api/murmurs?per_page=40&format=compact')
+    sparse = client.get('/api/murmurs?per_page=40&fields=id,content,user_id')
+
+    print(f'\npayload bytes: default {len(default.data)}, compact {len(compact.data)}, fields {len(sparse.data)}')
+    assert len(compact.data) < 0.75 * len(default.data)
+    assert len(sparse.data) < 0.5 * len(default.data)
+    assert len(default.get_json()['murmurs']) == len(compact.get_json()['murmurs']) == 40
+
+
+def test_compact_page_lists_each_author_once(client, seed):
+    seed(users=5, murmurs=40)
+
+    data = client.get('/api/murmurs?per_page=40&format=compact').get_json()
+    author_ids = {murmur['user_id'] for murmur in data['murmurs']}
+
+    assert sorted(int(user_id) for user_id in data['users']) == sorted(author_ids)
+    assert all('author' not in murmur for murmur in data['murmurs'])
+    assert all(str(user['id']) == user_id for user_id, user in data['users'].items())
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import event
+
+import app as murmur
+
+
+def count_queries(app, client, url):
+    # Start from cold caches so every page does the same work
+    services = app.extensions['murmur']
+    services['response_cache'].clear()
+    services['timeline_store'].clear()
+
+    statements = []
+    with app.app_context():
+        engine = murmur.db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+
+@pytest.mark.parametrize('url', [
+    '/api/murmurs?',
+    '/api/murmurs?cursor=&',
+    '/api/timeline?user_id=1&',
+    '/api/timeline?user_id=1&cursor=&',
+    '/api/users/1/murmurs?',
+    '/api/users/1/murmurs?cursor=&',
+])
+def test_query_count_does_not_grow_with_page_size(app, client, seed, url):
+    # 20 authors, user 1 follows 10 of them; pages embed many distinct authors
+    seed(users=20, murmurs=1000, follows=10)
+
+    small, small_page = count_queries(app, client, f'{url}per_page=5')
+    large, large_page = count_queries(app, client, f'{url}per_page=40')
+
+    assert len(small_page['murmurs']) == 5
+    assert len(large_page['murmurs']) == 40
+    assert small == large
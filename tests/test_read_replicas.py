@@ -0,0 +1,65 @@
+import shutil
+
+import pytest
+
+import app as murmur
+
+
+@pytest.fixture
+def app(tmp_path):
+    # The "replica" is a snapshot of the primary taken after seeding, so it
+    # lags behind every write made during the test
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = murmur.create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'SQLALCHEMY_REPLICA_URLS': [f'sqlite:///{replica}'],
+        'BLOB_STORAGE_PATH': str(tmp_path / 'blobs'),
+        'SECRET_KEY': 'test',
+    })
+    with app.app_context():
+        murmur.init_db()
+        murmur.db.session.add_all([
+            murmur.User(name=f'User {i}', username=f'user{i}', email=f'user{i}@example.com', password_hash='x')
+            for i in (1, 2)
+        ])
+        murmur.db.session.add(murmur.Murmur(content='seeded', user_id=2))
+        murmur.db.session.commit()
+        murmur.db.engine.dispose()
+    shutil.copy(primary, replica)
+    yield app
+    with app.app_context():
+        for engine in murmur.db.engines.values():
+            engine.dispose()
+
+
+def feed_contents(client):
+    return [item['content'] for item in client.get('/api/murmurs').get_json()['murmurs']]
+
+
+def test_readers_use_the_replica(app):
+    assert feed_contents(app.test_client()) == ['seeded']
+
+
+def test_writer_reads_its_write_despite_a_stale_cache_refill(app):
+    writer, other = app.test_client(), app.test_client()
+    assert feed_contents(other) == ['seeded']
+
+    response = writer.post('/api/me/murmurs', json={'user_id': 1, 'content': 'fresh'})
+    assert response.status_code == 201
+
+    # The lagging replica answers the other client, but that answer isn't cached
+    assert feed_contents(other) == ['seeded']
+    assert feed_contents(writer) == ['fresh', 'seeded']
+    assert feed_contents(writer) == ['fresh', 'seeded']
+
+
+def test_sticky_reads_bypass_cached_entries(app):
+    writer, other = app.test_client(), app.test_client()
+    writer.post('/api/me/murmurs', json={'user_id': 1, 'content': 'fresh'})
+
+    # Fill the cache entry of a single murmur from the replica, outside any
+    # invalidation window
+    app.extensions['murmur']['replica_router']._recent_invalidations.clear()
+    assert other.get('/api/users/1/murmurs').get_json()['murmurs'] == []
+
+    assert [item['content'] for item in writer.get('/api/users/1/murmurs').get_json()['murmurs']] == ['fresh']
@@ -0,0 +1,37 @@
+import pytest
+
+import app as murmur
+
+
+@pytest.fixture
+def other_worker(app):
+    # A second app on the same database, with its own response cache, as
+    # another gunicorn worker would have
+    worker = murmur.create_app({
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'SECRET_KEY': 'test',
+    })
+    yield worker
+    with worker.app_context():
+        murmur.db.engine.dispose()
+
+
+def likes_count(client):
+    return client.get('/api/murmurs/1').get_json()['murmur']['likes_count']
+
+
+def test_writer_sees_its_write_on_another_worker(app, client, seed, other_worker):
+    seed(users=2, murmurs=1)
+    reader = other_worker.test_client()
+    assert likes_count(reader) == 0
+
+    assert client.post('/api/murmurs/1/like', json={'user_id': 2}).status_code == 201
+    last_write = client.get_cookie(murmur.LAST_WRITE_COOKIE)
+    assert last_write is not None
+
+    # The other worker's cache still holds the pre-write body for readers
+    # (up to RESPONSE_CACHE_TTL), but not for the writer
+    assert likes_count(reader) == 0
+    writer = other_worker.test_client()
+    writer.set_cookie(murmur.LAST_WRITE_COOKIE, last_write.value)
+    assert likes_count(writer) == 1
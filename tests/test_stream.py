@@ -0,0 +1,22 @@
+def test_closing_a_stream_unsubscribes(app, client, seed):
+    seed(users=2)
+    broker = app.extensions['murmur']['event_broker']
+
+    response = client.get('/api/stream?user_id=1', buffered=False)
+    assert response.status_code == 200
+    assert next(response.response) == b'retry: 3000\n\n'
+    assert broker.subscriber_count() == 1
+
+    response.close()
+    assert broker.subscriber_count() == 0
+
+
+def test_stream_receives_new_murmurs(app, client, seed):
+    seed(users=2, follows=1)
+
+    response = client.get('/api/stream?user_id=1', buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    client.post('/api/me/murmurs', json={'user_id': 2, 'content': 'hello'})
+    assert b'event: murmur' in next(chunks)
+    response.close()
@@ -0,0 +1,77 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import app as murmur
+
+
+@pytest.fixture
+def liked(app, seed):
+    # Murmur 3 is liked by every user, murmur 2 by half of them, just now
+    seed(users=6, murmurs=5)
+    with app.app_context():
+        now = datetime.utcnow()
+        murmur.db.session.add_all(
+            [murmur.Like(user_id=user_id, murmur_id=3, created_at=now) for user_id in range(1, 7)] +
+            [murmur.Like(user_id=user_id, murmur_id=2, created_at=now) for user_id in range(1, 4)]
+        )
+        murmur.db.session.commit()
+
+
+def trending_ids(client):
+    response = client.get('/api/murmurs/trending')
+    assert response.status_code == 200
+    return [m['id'] for m in response.get_json()['murmurs']]
+
+
+def wait_until_loaded(app):
+    index = app.extensions['murmur']['trending_index']
+    deadline = time.monotonic() + 5
+    while index.loaded_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.loaded_at is not None
+
+
+def test_trending_is_rebuilt_off_the_request_thread(app, client, liked):
+    # Like queries issued by the thread serving requests
+    request_thread, likes_queries = threading.get_ident(), []
+    def listener(conn, cursor, statement, *args):
+        if threading.get_ident() == request_thread and 'FROM likes' in statement:
+            likes_queries.append(statement)
+    with app.app_context():
+        engine = murmur.db.engine
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        trending_ids(client)
+        wait_until_loaded(app)
+        assert trending_ids(client) == [3, 2]
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+        app.extensions['murmur']['trending_refresher'].stop()
+    assert likes_queries == []
+
+
+def test_rebuild_trending_command_seeds_new_workers(app, liked, tmp_path):
+    result = app.test_cli_runner().invoke(args=['rebuild-trending'])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / 'trending.json').exists()
+
+    # A worker started afterwards serves the ranking on its first request
+    worker = murmur.create_app({
+        'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+        'TRENDING_SNAPSHOT_PATH': app.config['TRENDING_SNAPSHOT_PATH'],
+        'SECRET_KEY': 'test',
+    })
+    try:
+        assert trending_ids(worker.test_client()) == [3, 2]
+    finally:
+        worker.extensions['murmur']['trending_refresher'].stop()
+        with worker.app_context():
+            murmur.db.engine.dispose()
+
+
+def test_trending_rejects_empty_pages(client):
+    assert client.get('/api/murmurs/trending?per_page=0').status_code == 404
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from sqlalchemy import event
+
+import app as murmur
+
+
+def usernames(client, query):
+    return [user['username'] for user in client.get(f'/api/users/typeahead?q={query}').get_json()['users']]
+
+
+def eventually(check):
+    # The index is reloaded by a background thread
+    deadline = time.monotonic() + 5
+    while not check() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert check()
+
+
+def test_typeahead_reloads_users_changed_by_other_workers(app, client, seed):
+    seed(users=3)
+    refresher = app.extensions['murmur']['typeahead_refresher']
+    refresher.interval = 0.05
+
+    # Queries issued by the thread serving requests
+    request_thread, statements = threading.get_ident(), []
+    def listener(conn, cursor, statement, *args):
+        if threading.get_ident() == request_thread:
+            statements.append(statement)
+    with app.app_context():
+        engine = murmur.db.engine
+    try:
+        event.listen(engine, 'before_cursor_execute', listener)
+        eventually(lambda: usernames(client, 'user') == ['user1', 'user2', 'user3'])
+        event.remove(engine, 'before_cursor_execute', listener)
+        assert statements == []
+
+        # Written straight to the database, as another worker process would
+        with app.app_context():
+            murmur.db.session.add(murmur.User(name='Late Comer', username='user4', email='user4@example.com', password_hash='x'))
+            murmur.db.session.get(murmur.User, 1).username = 'renamed1'
+            murmur.db.session.commit()
+        # 'renamed1' still matches through its name, User 1
+        eventually(lambda: usernames(client, 'user') == ['renamed1', 'user2', 'user3', 'user4'])
+        assert [user['id'] for user in client.get('/api/users/typeahead?q=renamed').get_json()['users']] == [1]
+    finally:
+        refresher.stop()
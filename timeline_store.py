@@ -0,0 +1,112 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+
+class TimelineStore:
+    """Precomputed home timelines: a bounded list of murmur entries per user.
+
+    Entries are ``(created_at, murmur_id)`` tuples. ``get`` returns them
+    newest first together with a ``complete`` flag, which is False once the
+    list has been truncated to its maximum length (older murmurs exist that
+    are not in the list). Backends only have to implement this interface;
+    the in-process one below is the default.
+    """
+
+    def get(self, user_id):
+        """Return ``(entries, complete)`` or None if the timeline isn't cached."""
+        raise NotImplementedError
+
+    def set(self, user_id, entries, complete):
+        """Replace a user's timeline with ``entries`` (newest first)."""
+        raise NotImplementedError
+
+    def push(self, user_ids, entry):
+        """Add ``entry`` to the cached timelines of ``user_ids``.
+
+        Users without a cached timeline are skipped; theirs is built from
+        the database on the next read.
+        """
+        raise NotImplementedError
+
+    def remove(self, user_ids, murmur_id):
+        """Drop ``murmur_id`` from the cached timelines of ``user_ids``."""
+        raise NotImplementedError
+
+    def invalidate(self, user_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryTimelineStore(TimelineStore):
+    """Process-local timeline store.
+
+    Each worker process keeps its own copy, so writes handled by another
+    worker are only seen here after ``max_age`` seconds, when the timeline is
+    rebuilt. ``max_users`` bounds memory by evicting the least recently read
+    timelines.
+    """
+
+    def __init__(self, max_length=800, max_users=100000, max_age=60):
+        self.max_length = max_length
+        self.max_users = max_users
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # user_id -> [entries oldest first, complete, built_at]
+        self._timelines = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            timeline = self._timelines.get(user_id)
+            if timeline is None:
+                return None
+
+            entries, complete, built_at = timeline
+            if self.max_age is not None and time.monotonic() - built_at > self.max_age:
+                del self._timelines[user_id]
+                return None
+
+            self._timelines.move_to_end(user_id)
+            return entries[::-1], complete
+
+    def set(self, user_id, entries, complete):
+        entries = sorted(entries)[-self.max_length:]
+        with self._lock:
+            self._timelines[user_id] = [entries, complete, time.monotonic()]
+            self._timelines.move_to_end(user_id)
+            while len(self._timelines) > self.max_users:
+                self._timelines.popitem(last=False)
+
+    def push(self, user_ids, entry):
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.get(user_id)
+                if timeline is None:
+                    continue
+
+                entries = timeline[0]
+                index = bisect.bisect_left(entries, entry)
+                if index < len(entries) and entries[index] == entry:
+                    continue
+                entries.insert(index, entry)
+                if len(entries) > self.max_length:
+                    del entries[:len(entries) - self.max_length]
+                    timeline[1] = False
+
+    def remove(self, user_ids, murmur_id):
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.get(user_id)
+                if timeline is not None:
+                    timeline[0] = [entry for entry in timeline[0] if entry[1] != murmur_id]
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._timelines.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
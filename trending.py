@@ -0,0 +1,249 @@
+"""Trending murmurs ranked by time-decayed like velocity.
+
+A murmur's score is its number of likes, with each like losing half its
+weight every ``half_life`` seconds; an unlike takes away one fresh like. Since
+all scores decay at the same rate, decay never changes the order: scores
+are stored relative to a reference time and only an incoming like or unlike
+touches the index. Every so often the scores are rebased onto the current
+time, which keeps the numbers small and drops murmurs that have gone cold.
+
+Only the best ``capacity`` murmurs are tracked. The ranking is a sorted
+list of ``(-rank, -murmur_id)`` pairs, rebuilt lazily after a change, so a
+page is a binary search. ``rank`` is ``log2(score)`` in half-lives since
+the epoch; it stays the same across rebases, which makes it usable in
+cursors.
+
+Each worker process keeps its own index and only sees the likes it handles
+itself. ``TrendingRefresher`` reconciles them from a background thread: it
+periodically replays recent likes from the database into the index and
+shares the result with the other processes through a snapshot file, so
+requests never wait on a rebuild.
+"""
+import bisect
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Rebase once the newest like would be worth this many times the oldest
+REBASE_AFTER_HALF_LIVES = 16
+# Rebuilds only read likes from the last few half-lives (0.4% of a like's weight left)
+LOOKBACK_HALF_LIVES = 8
+
+
+class TrendingIndex:
+    def __init__(self, half_life=6 * 3600, capacity=1000, min_score=0.05):
+        self.half_life = half_life
+        self.capacity = capacity
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._epoch = time.time()
+        self._scores = {}  # murmur_id -> score as of self._epoch
+        self._ranking = None  # sorted [(-rank, -murmur_id)], None when stale
+        self.loaded_at = None
+
+    @property
+    def lookback(self):
+        return self.half_life * LOOKBACK_HALF_LIVES
+
+    def load(self, likes, now=None):
+        """Replace the index with ``(murmur_id, liked_at)`` pairs, e.g. from the likes table."""
+        now = now or time.time()
+        # Naive datetimes in the database are UTC
+        reference = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None)
+        scale = 1 / self.half_life
+        scores = {}
+        for murmur_id, liked_at in likes:
+            scores[murmur_id] = scores.get(murmur_id, 0.0) + 2 ** ((liked_at - reference).total_seconds() * scale)
+
+        with self._lock:
+            self._epoch = now
+            self._scores = scores
+            self._prune()
+            self._ranking = None
+            self.loaded_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'half_life': self.half_life, 'epoch': self._epoch, 'scores': list(self._scores.items())}
+
+    def restore(self, snapshot):
+        """Load a ``snapshot()`` taken by this or another process; False if it doesn't fit."""
+        if snapshot.get('half_life') != self.half_life:
+            return False
+        with self._lock:
+            self._epoch = snapshot['epoch']
+            self._scores = {murmur_id: score for murmur_id, score in snapshot['scores']}
+            self._prune()
+            self._ranking = None
+            self.loaded_at = time.monotonic()
+        return True
+
+    def record(self, murmur_id, amount=1, now=None):
+        """Count ``amount`` likes (negative for unlikes) that happened at ``now``."""
+        now = now or time.time()
+        with self._lock:
+            if now - self._epoch > self.half_life * REBASE_AFTER_HALF_LIVES:
+                self._rebase(now)
+
+            weight = 2 ** ((now - self._epoch) / self.half_life)
+            score = self._scores.get(murmur_id, 0.0) + amount * weight
+            # Compared with a tolerance: liking and unliking may not cancel out exactly
+            if score > weight * 1e-9:
+                self._scores[murmur_id] = score
+            else:
+                self._scores.pop(murmur_id, None)
+
+            # Let the index overshoot a little so pruning is amortized
+            if len(self._scores) > self.capacity + self.capacity // 4:
+                self._prune()
+            self._ranking = None
+
+    def remove(self, murmur_id):
+        with self._lock:
+            if self._scores.pop(murmur_id, None) is not None:
+                self._ranking = None
+
+    def page(self, after=None, limit=20):
+        """Return up to ``limit`` murmur ids, hottest first, and the cursor of the next page.
+
+        ``after`` is the cursor returned with the previous page, a
+        ``(rank, murmur_id)`` pair. The cursor is None on the last page.
+        """
+        with self._lock:
+            if self._ranking is None:
+                self._ranking = sorted(
+                    (-self._rank(score), -murmur_id) for murmur_id, score in self._scores.items()
+                )
+            ranking = self._ranking
+
+        start = bisect.bisect_right(ranking, (-after[0], -after[1])) if after else 0
+        entries = ranking[start:start + limit]
+        next_cursor = None
+        if entries and start + limit < len(ranking):
+            next_cursor = (-entries[-1][0], -entries[-1][1])
+        return [-murmur_id for _, murmur_id in entries], next_cursor
+
+    def score(self, murmur_id, now=None):
+        """Current decayed score of a tracked murmur (0 if it isn't tracked)."""
+        now = now or time.time()
+        with self._lock:
+            return self._scores.get(murmur_id, 0.0) * 2 ** ((self._epoch - now) / self.half_life)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _rank(self, score):
+        # Rounded so the same score ranks identically before and after a rebase
+        return round(math.log2(score) + self._epoch / self.half_life, 9)
+
+    def _rebase(self, now):
+        factor = 2 ** ((self._epoch - now) / self.half_life)
+        self._scores = {
+            murmur_id: score * factor for murmur_id, score in self._scores.items()
+            if score * factor >= self.min_score
+        }
+        self._epoch = now
+
+    def _prune(self):
+        if len(self._scores) > self.capacity:
+            self._scores = dict(heapq.nlargest(self.capacity, self._scores.items(), key=lambda item: item[1]))
+
+
+class TrendingRefresher:
+    """Keeps a ``TrendingIndex`` current from a background thread.
+
+    Every ``interval`` seconds the thread either restores the snapshot file,
+    when another process (a worker, or ``flask rebuild-trending``) wrote it
+    during the last interval, or calls ``rebuild_func`` to reload the index
+    from the likes table and writes a new snapshot. Workers thereby share
+    one rebuild per interval instead of each running their own.
+
+    ``ensure_loaded`` is what requests call: it restores the snapshot if the
+    index is empty and starts the thread, but never rebuilds. Without a
+    snapshot the index stays empty until the thread's first rebuild, which
+    runs right away. An ``interval`` of 0 loads the index once.
+    """
+
+    def __init__(self, index, rebuild_func, snapshot_path, interval=600):
+        self.index = index
+        self.rebuild_func = rebuild_func
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snapshot_mtime = None  # of the snapshot this process last read or wrote
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def ensure_loaded(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                if self.index.loaded_at is None:
+                    self.restore()
+                self._thread = threading.Thread(target=self._run, name='trending-refresher', daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        mtime = self._mtime()
+        if mtime is not None and mtime != self._snapshot_mtime and time.time() - mtime < self.interval:
+            if self.restore():
+                return
+        self.rebuild()
+
+    def rebuild(self):
+        """Reload the index from the database and share it through the snapshot."""
+        self.rebuild_func()
+        if self.snapshot_path:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Write-then-rename so readers never see a partial snapshot
+            with open(self.snapshot_path + '.tmp', 'w') as f:
+                json.dump(self.index.snapshot(), f)
+            os.replace(self.snapshot_path + '.tmp', self.snapshot_path)
+            self._snapshot_mtime = self._mtime()
+
+    def restore(self):
+        mtime = self._mtime()
+        if mtime is None:
+            return False
+        try:
+            with open(self.snapshot_path) as f:
+                restored = self.index.restore(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.exception('Unreadable trending snapshot %s', self.snapshot_path)
+            return False
+        self._snapshot_mtime = mtime
+        return restored
+
+    def stop(self):
+        self._stopped.set()
+
+    def _mtime(self):
+        try:
+            return os.path.getmtime(self.snapshot_path) if self.snapshot_path else None
+        except OSError:
+            return None
+
+    def _run(self):
+        # A snapshot restored on startup is only kept if it is recent
+        if self.index.loaded_at is None or (
+            self.interval and time.time() - self._snapshot_mtime >= self.interval
+        ):
+            self._refresh()
+        while self.interval and not self._stopped.wait(self.interval):
+            self._refresh()
+
+    def _refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception('Trending refresh failed; keeping the current ranking')
@@ -0,0 +1,251 @@
+import bisect
+import logging
+import re
+import threading
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Must match the expression index created by migration 0003 on Postgres
+PG_DOCUMENT = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(username, '') || ' ' || coalesce(bio, ''))"
+
+
+def tokenize(query):
+    return TOKEN_PATTERN.findall(query.lower())
+
+
+def like_prefix(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class SearchBackend:
+    """Ranked user search over name, username and bio.
+
+    ``search`` returns ``(user_ids, total)`` for one page, best matches first,
+    with username prefix matches ranked above everything else.
+    """
+
+    def search(self, session, query, page, per_page):
+        raise NotImplementedError
+
+    def index_user(self, session, user):
+        """Bring the index up to date for a new or edited user (same transaction)."""
+
+    def rebuild(self, session):
+        """Reindex every user, e.g. after a bulk import."""
+
+
+class SqliteFtsSearch(SearchBackend):
+    """FTS5 index in the ``users_fts`` table, keyed by user id (rowid)."""
+
+    def search(self, session, query, page, per_page):
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+
+        # Every token must match, the last one as a prefix so typing narrows results
+        match = ' '.join(f'"{token}"' for token in tokens[:-1])
+        match = f'{match} "{tokens[-1]}"*'.strip()
+        params = {'match': match, 'prefix': like_prefix(query.strip()), 'limit': per_page,
+                  'offset': (page - 1) * per_page}
+
+        rows = session.execute(text("""
+            SELECT users_fts.rowid FROM users_fts JOIN users ON users.id = users_fts.rowid
+            WHERE users_fts MATCH :match
+            ORDER BY users.username LIKE :prefix ESCAPE '\\' DESC, bm25(users_fts, 5.0, 10.0, 1.0), users.id
+            LIMIT :limit OFFSET :offset
+        """), params).all()
+        total = session.execute(text('SELECT COUNT(*) FROM users_fts WHERE users_fts MATCH :match'), params).scalar()
+        return [row[0] for row in rows], total
+
+    def index_user(self, session, user):
+        session.execute(text('DELETE FROM users_fts WHERE rowid = :id'), {'id': user.id})
+        session.execute(
+            text('INSERT INTO users_fts (rowid, name, username, bio) VALUES (:id, :name, :username, :bio)'),
+            {'id': user.id, 'name': user.name, 'username': user.username, 'bio': user.bio or ''}
+        )
+
+    def rebuild(self, session):
+        session.execute(text('DELETE FROM users_fts'))
+        session.execute(text(
+            "INSERT INTO users_fts (rowid, name, username, bio) SELECT id, name, username, coalesce(bio, '') FROM users"
+        ))
+
+
+class PostgresSearch(SearchBackend):
+    """tsvector ranking plus pg_trgm for username prefixes and typos.
+
+    Both are expression indexes over the users table, so Postgres keeps them
+    in sync on its own and ``index_user`` has nothing to do.
+    """
+
+    def search(self, session, query, page, per_page):
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+
+        params = {'tsquery': ' & '.join(f'{token}:*' for token in tokens), 'query': query.strip(),
+                  'prefix': like_prefix(query.strip()), 'limit': per_page, 'offset': (page - 1) * per_page}
+        condition = f"{PG_DOCUMENT} @@ to_tsquery('simple', :tsquery) OR username % :query"
+
+        rows = session.execute(text(f"""
+            SELECT id FROM users WHERE {condition}
+            ORDER BY username ILIKE :prefix DESC,
+                     ts_rank({PG_DOCUMENT}, to_tsquery('simple', :tsquery)) + similarity(username, :query) DESC,
+                     id
+            LIMIT :limit OFFSET :offset
+        """), params).all()
+        total = session.execute(text(f'SELECT COUNT(*) FROM users WHERE {condition}'), params).scalar()
+        return [row[0] for row in rows], total
+
+
+class LikeSearch(SearchBackend):
+    """Unindexed ILIKE fallback for databases without a search index."""
+
+    def search(self, session, query, page, per_page):
+        params = {'pattern': f'%{query}%', 'prefix': like_prefix(query.strip()), 'limit': per_page,
+                  'offset': (page - 1) * per_page}
+        condition = 'lower(name) LIKE lower(:pattern) OR lower(username) LIKE lower(:pattern) OR lower(bio) LIKE lower(:pattern)'
+
+        rows = session.execute(text(f"""
+            SELECT id FROM users WHERE {condition}
+            ORDER BY lower(username) LIKE lower(:prefix) ESCAPE '\\' DESC, id
+            LIMIT :limit OFFSET :offset
+        """), params).all()
+        total = session.execute(text(f'SELECT COUNT(*) FROM users WHERE {condition}'), params).scalar()
+        return [row[0] for row in rows], total
+
+
+def search_backend_for(connection):
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        return PostgresSearch()
+    if dialect == 'sqlite':
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'")).first()
+        if exists:
+            return SqliteFtsSearch()
+    return LikeSearch()
+
+
+class PrefixIndex:
+    """In-memory typeahead index over usernames and names.
+
+    Keeps a sorted list of ``(term, user_id)`` pairs so a prefix lookup is a
+    binary search plus a short scan, and stores the small display record
+    returned for each user so answering needs no database access.
+
+    Changes made by other worker processes aren't seen until the index is
+    loaded again, which ``PrefixIndexRefresher`` does in the background.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._terms = []
+        self._users = {}  # user_id -> (terms, display record)
+        self.loaded_at = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def load(self, users):
+        # Built aside and swapped in, so searches during a reload see the old index
+        terms, records = [], {}
+        for user in users:
+            user_terms = self._terms_for(user)
+            records[user['id']] = (user_terms, user)
+            terms.extend(user_terms)
+        terms.sort()
+        with self._lock:
+            self._terms = terms
+            self._users = records
+            self.loaded_at = time.monotonic()
+
+    def add(self, user):
+        with self._lock:
+            self._remove(user['id'])
+            terms = self._terms_for(user)
+            self._users[user['id']] = (terms, user)
+            for term in terms:
+                bisect.insort(self._terms, term)
+
+    def search(self, prefix, limit=10):
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            index = bisect.bisect_left(self._terms, (prefix, -1))
+            while index < len(self._terms) and len(results) < limit:
+                term, user_id = self._terms[index]
+                if not term.startswith(prefix):
+                    break
+                if user_id not in seen:
+                    seen.add(user_id)
+                    results.append(self._users[user_id][1])
+                index += 1
+        return results
+
+    def _terms_for(self, user):
+        terms = {(user['username'].lower(), user['id'])}
+        terms.update((token, user['id']) for token in tokenize(user['name']))
+        return terms
+
+    def _remove(self, user_id):
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return
+        for term in entry[0]:
+            index = bisect.bisect_left(self._terms, term)
+            if index < len(self._terms) and self._terms[index] == term:
+                del self._terms[index]
+
+
+class PrefixIndexRefresher:
+    """Reloads a ``PrefixIndex`` from a background thread.
+
+    ``load_func`` returns the display records of every user. The thread
+    calls it as soon as ``ensure_started`` is first called and then every
+    ``interval`` seconds (0 = only once), so no search waits on the full
+    scan of the users table. Searches keep using the previous index while a
+    reload runs, and find nothing before the first load completes.
+    """
+
+    def __init__(self, index, load_func, interval=60):
+        self.index = index
+        self.load_func = load_func
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='typeahead-refresher', daemon=True)
+                self._thread.start()
+
+    def reload(self):
+        self.index.load(self.load_func())
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        self._reload()
+        while self.interval and not self._stopped.wait(self.interval):
+            self._reload()
+
+    def _reload(self):
+        try:
+            self.reload()
+        except Exception:
+            logger.exception('Typeahead reload failed; keeping the current index')
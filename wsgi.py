@@ -0,0 +1,8 @@
+"""Production WSGI entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+The database schema is not created here; run ``flask --app app init-db``
+(new database) or ``flask --app app db-upgrade`` (existing one) first.
+"""
+from app import create_app
+
+app = create_app()